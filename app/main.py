@@ -1,22 +1,71 @@
 import os
+import io
+import asyncio
 import sys
 import pathlib
 import threading
 import subprocess
 import sqlite3
+import aiosqlite
 import json
+import re
+import zlib
 from datetime import datetime, timedelta
 from fastapi import FastAPI, Request, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
+from pydantic import BaseModel, ValidationError, field_validator
 from typing import List, Optional, Dict, Any
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
 from dotenv import load_dotenv
 import chromadb
+import tiktoken
 from chromadb.config import Settings
 import hashlib
 import time
 import importlib.util
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import orjson
+from cachetools import TTLCache
+
+try:
+    import simsimd  # SIMD kernels for vector similarity (optional)
+except ImportError:
+    simsimd = None
+
+try:
+    import h2  # noqa: F401 -- lets httpx negotiate HTTP/2 (optional)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Use a default style guide if prompts module isn't available
+try:
+    from prompts import STYLE_GUIDE
+except ImportError:
+    try:
+        from app.prompts import STYLE_GUIDE
+    except ImportError:
+        # Fallback style guide
+        STYLE_GUIDE = """
+You are Robert Rodriguez Jr's Academy Assistant. Tone: clear, practical, encouraging.
+Answer ONLY from provided context. If missing, say you don't know and suggest the closest lesson.
+Format:
+1) Summary (3–6 sentences)
+2) How to apply (bulleted steps)
+3) Sources (title + deep link + timestamp/page if present)
+Keep citations precise.
+"""
+
+USER_PROMPT_TEMPLATE = """Question: {query}
+
+Context from Academy Knowledge Base:
+{context}
+
+Provide an answer following the format guidelines (summary, how to apply, sources)."""
 
 load_dotenv()
 
@@ -29,10 +78,73 @@ ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "supersecret123")
 CHROMA_DIR = os.getenv("CHROMA_DIR", str(BASE_DIR / "data" / "chroma"))
 COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "academy_kb")
 EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
 METRICS_DB = os.getenv("METRICS_DB", str(BASE_DIR / "data" / "telemetry.db"))
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Query cache settings
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_DISK_CACHE_SIZE = int(os.getenv("EMBED_DISK_CACHE_SIZE", "50000"))  # rows kept in embed_cache table
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+ANSWER_EXACT_CACHE_SIZE = int(os.getenv("ANSWER_EXACT_CACHE_SIZE", "1024"))
+# Paraphrases of a stored Q&A question at or above this cosine similarity get its answer
+QA_MATCH_THRESHOLD = float(os.getenv("QA_MATCH_THRESHOLD", "0.93"))
+# A failed Q&A index build is retried after this many seconds, doubling up to QA_RETRY_MAX
+QA_RETRY_BACKOFF = float(os.getenv("QA_RETRY_BACKOFF", "5"))
+QA_RETRY_MAX = float(os.getenv("QA_RETRY_MAX", "300"))
+QUERY_CACHE_DB = os.getenv("QUERY_CACHE_DB", str(BASE_DIR / "data" / "query_cache.sqlite"))
+
+# Embedding micro-batching (coalesce concurrent queries into one API call)
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))
+EMBED_BATCH_FLUSH_MS = float(os.getenv("EMBED_BATCH_FLUSH_MS", "10"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "8000"))
+
+# Context sent to the LLM is trimmed to this many tokens
+KB_MAX_PROMPT_TOKENS = int(os.getenv("KB_MAX_PROMPT_TOKENS", "3000"))
+# Upper bound on chunks retrieved per query, whatever top_k the client asks for
+KB_MAX_TOP_K = int(os.getenv("KB_MAX_TOP_K", "10"))
+# Drop retrieved chunks whose distance trails the best match by more than this
+KB_RELEVANCE_MARGIN = float(os.getenv("KB_RELEVANCE_MARGIN", "0.15"))
+
+# Serve retrieval from an in-process copy of the vectors instead of Chroma's HNSW
+KB_MEMORY_INDEX = os.getenv("KB_MEMORY_INDEX", "0") == "1"
+# Two-stage search: shortlist on truncated (Matryoshka) vectors, rerank on full ones
+KB_SHORTLIST_DIMS = int(os.getenv("KB_SHORTLIST_DIMS", "512"))
+KB_SHORTLIST_K = int(os.getenv("KB_SHORTLIST_K", "100"))
+
+# Analytics rows waiting to be written; beyond this new rows are dropped
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+
+# /index-status vector count and last_indexed are cached this long (seconds);
+# this also bounds how long a CLI or sync-script run takes to show up there
+INDEX_COUNT_TTL = float(os.getenv("INDEX_COUNT_TTL", "30"))
+
+# Dashboard metrics are served from a snapshot at most this old (seconds)
+METRICS_CACHE_TTL = float(os.getenv("METRICS_CACHE_TTL", "60"))
+
+# Uploads larger than this are rejected with 413
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1 << 20
+# gzip-encoded request bodies are rejected with 413 once they inflate past this
+GZIP_BODY_MAX_BYTES = int(os.getenv("GZIP_BODY_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Max records per ChromaDB add/upsert/update call
+CHROMA_BATCH = int(os.getenv("CHROMA_BATCH", "200"))
+
+# Seconds between progress checks behind /admin/reindex-events; a keep-alive
+# comment goes out after REINDEX_EVENTS_KEEPALIVE seconds without changes
+REINDEX_EVENTS_INTERVAL = float(os.getenv("REINDEX_EVENTS_INTERVAL", "1"))
+REINDEX_EVENTS_KEEPALIVE = float(os.getenv("REINDEX_EVENTS_KEEPALIVE", "15"))
+
+# Initialize OpenAI client (async so /query doesn't tie up the threadpool).
+# One pooled keep-alive HTTP client is shared by every request.
+http_client = DefaultAsyncHttpxClient(
+    http2=HTTP2_AVAILABLE,
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
 
 # Initialize ChromaDB
 chroma_client = chromadb.PersistentClient(
@@ -40,7 +152,7 @@ chroma_client = chromadb.PersistentClient(
     settings=Settings(allow_reset=True)
 )
 
-app = FastAPI(title="Academy KB API")
+app = FastAPI(title="Academy KB API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -49,11 +161,118 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class GzipRequestMiddleware:
+    """Inflate request bodies sent with Content-Encoding: gzip (e.g. compressed uploads) as they stream in"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            k == b"content-encoding" and v.strip().lower() == b"gzip" for k, v in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        # The body handed on is plain, so drop the headers that described the compressed one
+        scope = dict(scope)
+        scope["headers"] = [
+            (k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")
+        ]
+        inflater = zlib.decompressobj(wbits=31)
+        inflated = 0
+        
+        async def gunzip_receive():
+            nonlocal inflated
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            data = message.get("body", b"")
+            parts = []
+            try:
+                # Never inflate more than one byte past the limit, however small the compressed input
+                while True:
+                    part = inflater.decompress(data, GZIP_BODY_MAX_BYTES - inflated + 1)
+                    inflated += len(part)
+                    if inflated > GZIP_BODY_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail="Decompressed request body too large")
+                    parts.append(part)
+                    data = inflater.unconsumed_tail
+                    if not data:
+                        break
+                if not message.get("more_body", False):
+                    part = inflater.flush()
+                    inflated += len(part)
+                    if inflated > GZIP_BODY_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail="Decompressed request body too large")
+                    parts.append(part)
+            except zlib.error:
+                raise HTTPException(status_code=400, detail="Invalid gzip request body")
+            return {**message, "body": b"".join(parts)}
+        
+        await self.app(scope, gunzip_receive, send)
+
+app.add_middleware(GzipRequestMiddleware)
+
+# === Database Connection ===
+_db_local = threading.local()
+
+def _db() -> sqlite3.Connection:
+    """Per-thread sqlite connection (autocommit, WAL) reused across requests"""
+    con = getattr(_db_local, "con", None)
+    if con is None:
+        con = sqlite3.connect(METRICS_DB, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        con.execute("PRAGMA cache_size=-65536")  # 64 MB
+        con.execute("PRAGMA busy_timeout=5000")
+        _db_local.con = con
+    return con
+
+# Long-lived async connection for the dashboard analytics endpoints
+_analytics_db: Optional[aiosqlite.Connection] = None
+
+async def analytics_db() -> aiosqlite.Connection:
+    """App-lifetime aiosqlite connection; keeps the page cache warm between dashboard loads"""
+    global _analytics_db
+    if _analytics_db is None:
+        con = await aiosqlite.connect(METRICS_DB)
+        await con.execute("PRAGMA busy_timeout=5000")
+        await con.execute("PRAGMA cache_size=-65536")
+        await con.execute("PRAGMA mmap_size=268435456")
+        _analytics_db = con
+    return _analytics_db
+
+DB_MAINTENANCE_INTERVAL = int(os.getenv("DB_MAINTENANCE_INTERVAL", "900"))  # seconds
+
+async def db_execute(sql: str, params: tuple = ()):
+    """Run a write on a worker thread's connection so the event loop never waits on disk"""
+    await asyncio.to_thread(lambda: _db().execute(sql, params))
+
+def db_maintenance():
+    """Keep the WAL file short and the query planner's statistics fresh"""
+    con = _db()
+    con.execute("""
+        DELETE FROM embed_cache WHERE key IN (
+            SELECT key FROM embed_cache ORDER BY created DESC LIMIT -1 OFFSET ?
+        )
+    """, (EMBED_DISK_CACHE_SIZE,))
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    con.execute("PRAGMA optimize")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different spellings share cache/Q&A keys"""
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
 # === Initialize Database Tables ===
 def init_database():
     """Initialize all required database tables"""
     os.makedirs(os.path.dirname(METRICS_DB), exist_ok=True)
-    con = sqlite3.connect(METRICS_DB)
+    con = _db()
     cur = con.cursor()
     
     # Documents table (existing)
@@ -72,7 +291,9 @@ def init_database():
       tokens INTEGER,
       chunk_count INTEGER,
       last_indexed TEXT,
-      status TEXT DEFAULT 'indexed'
+      status TEXT DEFAULT 'indexed',
+      content_sha1 TEXT,
+      mtime REAL
     )
     """)
     
@@ -88,6 +309,22 @@ def init_database():
     )
     """)
     
+    # Chat interactions (read by the metrics and user analytics dashboards)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chats (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      ts TEXT,
+      user_id TEXT,
+      question TEXT,
+      answer TEXT,
+      sources_json TEXT,
+      tokens_in INTEGER,
+      tokens_out INTEGER,
+      ms INTEGER,
+      cost_usd REAL
+    )
+    """)
+    
     # Text training data
     cur.execute("""
     CREATE TABLE IF NOT EXISTS text_training (
@@ -110,6 +347,29 @@ def init_database():
     )
     """)
     
+    # Query embeddings that survive restarts (second tier behind the in-process LRU)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS embed_cache (
+      key TEXT PRIMARY KEY,
+      vec BLOB,
+      created REAL
+    )
+    """)
+    
+    # Reindex runs and their progress (one row per run)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS reindex_progress (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      started_at TEXT,
+      updated_at TEXT,
+      status TEXT,
+      files_done INTEGER DEFAULT 0,
+      files_total INTEGER DEFAULT 0,
+      chunks INTEGER DEFAULT 0,
+      message TEXT
+    )
+    """)
+    
     # Add image_url column to existing qa_pairs table if it doesn't exist
     try:
         cur.execute("ALTER TABLE qa_pairs ADD COLUMN image_url TEXT")
@@ -117,20 +377,68 @@ def init_database():
         # Column already exists
         pass
     
-    con.commit()
-    con.close()
+    # Change-detection columns written by the indexer
+    for col in ("content_sha1 TEXT", "mtime REAL"):
+        try:
+            cur.execute(f"ALTER TABLE documents ADD COLUMN {col}")
+        except sqlite3.OperationalError:
+            pass
+    
+    # Normalized question for indexed exact-match lookups (backfilled for older rows)
+    try:
+        cur.execute("ALTER TABLE qa_pairs ADD COLUMN question_norm TEXT")
+    except sqlite3.OperationalError:
+        pass
+    missing = cur.execute("SELECT id, question FROM qa_pairs WHERE question_norm IS NULL").fetchall()
+    if missing:
+        cur.executemany(
+            "UPDATE qa_pairs SET question_norm = ? WHERE id = ?",
+            [(normalize_query(q or ""), qa_id) for qa_id, q in missing]
+        )
+    
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_docs_last_indexed ON documents(last_indexed)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_ts ON chats(ts)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_ts ON chats(user_id, ts)")
+    cur.execute("DROP INDEX IF EXISTS idx_qa_lower_question")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_qa_question_norm ON qa_pairs(question_norm)")
 
 # Initialize database on startup
 init_database()
 
 # === Indexing Functions ===
+_INDEXER = None
+_indexer_lock = threading.Lock()
+_reindex_lock = threading.Lock()
+
 def load_indexing_module():
-    """Dynamically load the indexing module to avoid circular imports"""
-    script_path = BASE_DIR / "scripts" / "build_index.py"
-    spec = importlib.util.spec_from_file_location("build_index", script_path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
+    """Load scripts/build_index.py once (dynamically, to avoid circular imports)"""
+    global _INDEXER
+    if _INDEXER is not None:
+        return _INDEXER
+    with _indexer_lock:
+        if _INDEXER is None:
+            script_path = BASE_DIR / "scripts" / "build_index.py"
+            spec = importlib.util.spec_from_file_location("build_index", script_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            # Share this process's Chroma client and DB instead of opening second ones
+            module.chroma_client = chroma_client
+            module.METRICS_DB = METRICS_DB
+            # Open files relative to the repo, but store the same paths/doc_ids the CLI does
+            module.ROOT_DIR = str(BASE_DIR)
+            _INDEXER = module
+        return _INDEXER
+
+def _preload_indexer():
+    try:
+        load_indexing_module()
+    except Exception as e:
+        print(f"Failed to preload indexer: {e}")
+
+@app.on_event("startup")
+async def preload_indexer():
+    # Import build_index in the background so the first upload doesn't pay for it
+    threading.Thread(target=_preload_indexer, daemon=True).start()
 
 def index_single_file(file_path: str, filename: str) -> Dict:
     """Index a single uploaded file"""
@@ -147,21 +455,24 @@ def index_single_file(file_path: str, filename: str) -> Dict:
         doc_id = indexer.file_id(file_path)
         title = indexer.title_from_meta_or_path(meta, filename)
         
-        # Tokenize and chunk
+        # Tokenize once and chunk over the token ids
         tokens = indexer.tokenize(text)
-        chunk_texts = indexer.chunk_text(text, indexer.CHUNK_TOKENS, indexer.CHUNK_OVERLAP)
+        windows = indexer.chunk_windows(tokens, indexer.CHUNK_TOKENS, indexer.CHUNK_OVERLAP)
         
-        if not chunk_texts:
+        if not windows:
             return {"status": "error", "message": "Could not create chunks from file"}
-        
-        # Create embeddings
-        embeddings = indexer.embed_all(chunk_texts)
+        chunk_texts = [indexer.detokenize(w) for w in windows]
         
         # Get collection
-        collection = indexer.get_collection()
+        collection = get_collection() or indexer.get_collection()
         
-        # Prepare data for ChromaDB
-        chunk_ids = [indexer.make_chunk_id(doc_id, i) for i in range(len(chunk_texts))]
+        # Content-addressed chunk IDs so unchanged chunks keep their embeddings
+        chunk_hashes = [indexer.chunk_hash(t) for t in chunk_texts]
+        chunk_ids = indexer.make_hashed_chunk_ids(doc_id, chunk_hashes)
+        existing_ids = set(collection.get(where={"doc_id": doc_id}, include=[])["ids"])
+        new_idx = [i for i, cid in enumerate(chunk_ids) if cid not in existing_ids]
+        kept_idx = [i for i, cid in enumerate(chunk_ids) if cid in existing_ids]
+        stale_ids = list(existing_ids.difference(chunk_ids))
         
         # Base metadata for all chunks
         base_meta = {
@@ -174,19 +485,42 @@ def index_single_file(file_path: str, filename: str) -> Dict:
         
         # Normalize metadata
         normalized_meta = indexer.normalize_metadata({**meta, **base_meta})
-        chunk_metas = [normalized_meta for _ in range(len(chunk_texts))]
-        
-        # Add chunk index to each metadata
-        for i, chunk_meta in enumerate(chunk_metas):
-            chunk_meta["chunk_index"] = i
-        
-        # Upsert to ChromaDB
-        collection.upsert(
-            ids=chunk_ids,
-            documents=chunk_texts,
-            embeddings=embeddings,
-            metadatas=chunk_metas
-        )
+        normalized_meta["meta_block"] = indexer.render_meta_block({
+            **normalized_meta,
+            "url": normalized_meta.get("url") or generate_url_from_title(title, "upload", base_meta["path"]),
+        })
+        chunk_metas = [
+            {**normalized_meta, "chunk_index": i, "chunk_hash": h}
+            for i, h in enumerate(chunk_hashes)
+        ]
+        
+        # Embed and insert only chunks that aren't already stored
+        if new_idx:
+            embeddings = indexer.embed_all_cached(
+                [chunk_texts[i] for i in new_idx],
+                token_counts=[len(windows[i]) for i in new_idx]
+            )
+            for start in range(0, len(new_idx), CHROMA_BATCH):
+                batch = new_idx[start:start + CHROMA_BATCH]
+                collection.upsert(
+                    ids=[chunk_ids[i] for i in batch],
+                    documents=[chunk_texts[i] for i in batch],
+                    embeddings=embeddings[start:start + CHROMA_BATCH],
+                    metadatas=[chunk_metas[i] for i in batch]
+                )
+        
+        # Unchanged chunks only need fresh metadata (position, timestamp)
+        if kept_idx:
+            for start in range(0, len(kept_idx), CHROMA_BATCH):
+                batch = kept_idx[start:start + CHROMA_BATCH]
+                collection.update(
+                    ids=[chunk_ids[i] for i in batch],
+                    metadatas=[chunk_metas[i] for i in batch]
+                )
+        
+        # Drop chunks that no longer exist in the new version
+        if stale_ids:
+            collection.delete(ids=stale_ids)
         
         # Update document tracking database
         indexer.upsert_document_row({
@@ -203,6 +537,8 @@ def index_single_file(file_path: str, filename: str) -> Dict:
             "tokens": len(tokens),
             "chunk_count": len(chunk_texts),
             "last_indexed": base_meta["last_indexed"],
+            "content_sha1": indexer.content_sha1(meta, text),
+            "mtime": os.path.getmtime(file_path),
             "status": "indexed"
         })
         
@@ -211,7 +547,8 @@ def index_single_file(file_path: str, filename: str) -> Dict:
             "doc_id": doc_id,
             "title": title,
             "chunks": len(chunk_texts),
-            "tokens": len(tokens)
+            "tokens": len(tokens),
+            "embedded": len(new_idx)
         }
         
     except Exception as e:
@@ -223,6 +560,13 @@ class QueryIn(BaseModel):
     query: str
     top_k: Optional[int] = 5
     user_id: Optional[str] = None
+    no_cache: bool = False  # skip the cached-answer tiers (a fresh answer is still cached)
+
+    @field_validator("top_k")
+    @classmethod
+    def clamp_top_k(cls, v):
+        """Keep retrieval bounded: 1..KB_MAX_TOP_K (missing means 5)"""
+        return 5 if v is None else max(1, min(v, KB_MAX_TOP_K))
 
 class Source(BaseModel):
     title: Optional[str] = None
@@ -242,6 +586,12 @@ class QAPairIn(BaseModel):
     answer: str
     image_url: Optional[str] = None
 
+class ChunkImportIn(BaseModel):
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    embeddings: Optional[List[List[float]]] = None  # absent when sent as a binary .npy part
+
 # === Utils ===
 def _require_admin(req: Request):
     auth = req.headers.get("authorization", "")
@@ -251,88 +601,752 @@ def _require_admin(req: Request):
     if token != ADMIN_TOKEN:
         raise HTTPException(status_code=403, detail="Forbidden")
 
+_collection = None
+_collection_lock = threading.RLock()
+
 def get_collection():
-    """Get or create the ChromaDB collection"""
-    try:
-        return chroma_client.get_collection(COLLECTION_NAME)
-    except Exception:
-        return None
+    """Get the ChromaDB collection (handle is cached across requests)"""
+    global _collection
+    collection = _collection
+    if collection is not None:
+        return collection
+    with _collection_lock:
+        if _collection is None:
+            try:
+                # vectors always come from our own OpenAI calls; never let Chroma embed text itself
+                _collection = chroma_client.get_collection(COLLECTION_NAME, embedding_function=None)
+            except Exception:
+                return None
+        return _collection
+
+def cosine_distances(collection, distances: List[List[float]]) -> List[List[float]]:
+    """Chroma distances on the 1 - cosine scale select_context and top_score expect.
+
+    Collections created before build_index switched to "ip" use Chroma's default
+    squared-L2 space; for unit vectors that is 2 * (1 - cosine).
+    """
+    if (collection.metadata or {}).get("hnsw:space", "l2") != "l2":
+        return distances
+    return [[d / 2.0 for d in row] for row in distances]
+
+def reset_collection_cache():
+    """Drop the cached handle so the next request reopens the collection"""
+    global _collection
+    with _collection_lock:
+        _collection = None
+
+# === Vector Similarity ===
+def cosine_scores(matrix: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each row of a float32 matrix against q (rows and q unit-normalized)"""
+    if simsimd is not None:
+        return 1.0 - np.asarray(simsimd.cdist(matrix, q[None, :], metric="cosine"), dtype=np.float32).ravel()
+    return matrix @ q
+
+# === In-Memory Vector Index ===
+class MemoryVectorIndex:
+    """Flat inner-product search over unit-normalized vectors loaded from Chroma"""
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.short_vectors: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.stale = True
+        self.lock = threading.Lock()
+
+    def mark_stale(self):
+        self.stale = True
+
+    def build(self, collection):
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        else:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+        self.vectors = vectors
+        self.short_vectors = None
+        if 0 < KB_SHORTLIST_DIMS < vectors.shape[1]:
+            # text-embedding-3 vectors stay meaningful when truncated and renormalized
+            short = np.ascontiguousarray(vectors[:, :KB_SHORTLIST_DIMS])
+            norms = np.linalg.norm(short, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.short_vectors = short / norms
+        self.ids = list(data["ids"])
+        self.documents = list(data["documents"])
+        self.metadatas = list(data["metadatas"])
+        self.stale = False
+        print(f"Memory index built with {len(self.ids)} vectors")
+
+    def search(self, collection, query_embedding, k: int) -> Optional[Dict]:
+        """Return results shaped like collection.query(), or None to fall back to Chroma"""
+        with self.lock:
+            if self.stale:
+                self.build(collection)
+            vectors, short_vectors = self.vectors, self.short_vectors
+            ids, documents, metadatas = self.ids, self.documents, self.metadatas
+
+        q = np.asarray(query_embedding, dtype=np.float32)
+        if vectors is None or vectors.shape[0] == 0 or vectors.shape[1] != q.shape[0]:
+            return None
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        if short_vectors is not None and len(vectors) > KB_SHORTLIST_K >= k:
+            qs = q[:KB_SHORTLIST_DIMS]
+            qs = qs / (np.linalg.norm(qs) or 1.0)
+            short_scores = cosine_scores(short_vectors, qs)
+            candidates = np.argpartition(-short_scores, KB_SHORTLIST_K - 1)[:KB_SHORTLIST_K]
+        else:
+            candidates = np.arange(len(vectors))
+
+        cand_scores = cosine_scores(vectors[candidates], q)
+        k = min(k, len(cand_scores))
+        best = np.argpartition(-cand_scores, k - 1)[:k]
+        best = best[np.argsort(-cand_scores[best])]
+        top = candidates[best]
+        return {
+            "ids": [[ids[i] for i in top]],
+            "documents": [[documents[i] for i in top]],
+            "metadatas": [[metadatas[i] for i in top]],
+            "distances": [[float(1.0 - cand_scores[j]) for j in best]],
+        }
+
+memory_index = MemoryVectorIndex()
+
+# === Background Tasks ===
+# The event loop only holds weak references to tasks; fire-and-forget ones live here until done
+_background_tasks: set = set()
+
+def _background_task_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background task failed: {task.exception()!r}")
+
+def spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background without awaiting it"""
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+# === Embedding Batcher ===
+_ENC = None
+
+def count_tokens(text: str) -> int:
+    global _ENC
+    if _ENC is None:
+        _ENC = tiktoken.get_encoding("cl100k_base")
+    return len(_ENC.encode(text))
+
+_PROMPT_ENC = None
+
+def count_prompt_tokens(text: str) -> int:
+    global _PROMPT_ENC
+    if _PROMPT_ENC is None:
+        try:
+            _PROMPT_ENC = tiktoken.encoding_for_model(CHAT_MODEL)
+        except KeyError:
+            _PROMPT_ENC = tiktoken.get_encoding("o200k_base")
+    return len(_PROMPT_ENC.encode(text))
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over the words of the first 512 chars"""
+    words = text[:512].lower().split()
+    if not words:
+        return 0
+    digests = b"".join(hashlib.md5(w.encode("utf-8")).digest()[:8] for w in words)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1).astype(np.int32)
+    votes = (bits * 2 - 1).sum(axis=0)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
 
-def embed_query(text: str) -> List[float]:
-    """Embed a query using OpenAI"""
+def select_context(documents: List[str], distances: List[float], budget: int) -> List[int]:
+    """Pick chunk indexes best-first, skipping weak matches and near-duplicates, until the token budget is spent"""
+    chosen: List[int] = []
+    fingerprints: List[int] = []
+    used = 0
+    cutoff = distances[0] + KB_RELEVANCE_MARGIN if distances and KB_RELEVANCE_MARGIN > 0 else None
+    for i, doc in enumerate(documents):
+        if cutoff is not None and i < len(distances) and distances[i] > cutoff:
+            break
+        fp = simhash(doc)
+        if any(bin(fp ^ other).count("1") <= 3 for other in fingerprints):
+            continue
+        tokens = count_prompt_tokens(doc)
+        if chosen and used + tokens > budget:
+            break
+        chosen.append(i)
+        fingerprints.append(fp)
+        used += tokens
+    return chosen
+
+class EmbeddingBatcher:
+    """Coalesce embedding requests that arrive within a short window into one API call"""
+
+    def __init__(self, max_batch: int, flush_ms: float, max_tokens: int):
+        self.max_batch = max_batch
+        self.flush_s = flush_ms / 1000.0
+        self.max_tokens = max_tokens
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.loop = None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            self.task = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> List[float]:
+        self._ensure_started()
+        fut = self.loop.create_future()
+        await self.queue.put((text, count_tokens(text), fut))
+        return await fut
+
+    async def _run(self):
+        carry = None
+        while True:
+            first = carry or await self.queue.get()
+            carry = None
+            batch = [first]
+            tokens = first[1]
+            deadline = self.loop.time() + self.flush_s
+            while len(batch) < self.max_batch:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if tokens + item[1] > self.max_tokens:
+                    carry = item
+                    break
+                batch.append(item)
+                tokens += item[1]
+            spawn(self._flush(batch))
+
+    async def _flush(self, batch):
+        # Callers that gave up (e.g. answered from Q&A) don't need an embedding
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        try:
+            response = await client.embeddings.create(
+                model=EMBED_MODEL,
+                input=[text for text, _, _ in batch]
+            )
+            for d in response.data:
+                fut = batch[d.index][2]
+                if not fut.done():
+                    fut.set_result(d.embedding)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+embed_batcher = EmbeddingBatcher(EMBED_BATCH_MAX, EMBED_BATCH_FLUSH_MS, EMBED_BATCH_MAX_TOKENS)
+
+async def embed_query(text: str) -> np.ndarray:
+    """Embed a query using OpenAI (float32 vector)"""
     try:
-        response = client.embeddings.create(
-            model=EMBED_MODEL,
-            input=text
-        )
-        return response.data[0].embedding
+        return np.asarray(await embed_batcher.embed(text), dtype=np.float32)
     except Exception as e:
         print(f"Embedding error: {e}")
         raise HTTPException(status_code=500, detail="Failed to create embedding")
 
+# === Query Cache ===
+_embed_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_embed_cache_lock = threading.Lock()
+_embed_cache_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+def _query_key(text: str) -> str:
+    """Cache key for a query string under the current model (case/whitespace insensitive)"""
+    return hashlib.sha256(f"{EMBED_MODEL}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+def embed_cache_info() -> Dict[str, Any]:
+    with _embed_cache_lock:
+        hits, disk_hits, misses = _embed_cache_stats["hits"], _embed_cache_stats["disk_hits"], _embed_cache_stats["misses"]
+        size = len(_embed_cache)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "disk_hits": disk_hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 3) if total else 0.0,
+        "size": size,
+        "max_size": EMBED_CACHE_SIZE
+    }
+
+def clear_embed_cache():
+    with _embed_cache_lock:
+        _embed_cache.clear()
+
+INSERT_EMBED_SQL = "INSERT OR IGNORE INTO embed_cache (key, vec, created) VALUES (?, ?, ?)"
+
+def _load_cached_embedding(key: str) -> Optional[np.ndarray]:
+    """Look up a query embedding persisted by an earlier process"""
+    row = _db().execute("SELECT vec FROM embed_cache WHERE key = ?", (key,)).fetchone()
+    return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+async def embed_query_cached(text: str) -> np.ndarray:
+    """Embed a query (unit-normalized float32), reusing the vector for repeated questions"""
+    key = _query_key(text)
+    with _embed_cache_lock:
+        vec = _embed_cache.get(key)
+        if vec is not None:
+            _embed_cache.move_to_end(key)
+            _embed_cache_stats["hits"] += 1
+            return vec
+
+    try:
+        vec = await asyncio.to_thread(_load_cached_embedding, key)
+    except sqlite3.Error as e:
+        print(f"Embedding cache read failed: {e}")
+        vec = None
+
+    if vec is not None:
+        with _embed_cache_lock:
+            _embed_cache_stats["hits"] += 1
+            _embed_cache_stats["disk_hits"] += 1
+    else:
+        with _embed_cache_lock:
+            _embed_cache_stats["misses"] += 1
+        vec = await embed_query(text)
+        norm = float(np.linalg.norm(vec))
+        if norm:
+            vec = vec / norm
+        log_writer.put(INSERT_EMBED_SQL, (key, vec.tobytes(), time.time()))
+    vec.setflags(write=False)  # shared by every hit on this key
+
+    with _embed_cache_lock:
+        _embed_cache[key] = vec
+        _embed_cache.move_to_end(key)
+        while len(_embed_cache) > EMBED_CACHE_SIZE:
+            _embed_cache.popitem(last=False)
+    return vec
+
+class SemanticAnswerCache:
+    """Reuse answers for repeated questions: exact (normalized text) first, then by cosine similarity"""
+
+    def __init__(self, size: int, threshold: float, ttl: float, exact_size: int = 1024):
+        self.exact = TTLCache(maxsize=exact_size, ttl=ttl)  # (normalized query, top_k) -> payload
+        self.size = size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.matrix = None  # (size, dim) float32 ring buffer, rows are unit vectors
+        self.top_k = np.zeros(size, dtype=np.int32)
+        self.created = np.zeros(size, dtype=np.float64)
+        self.payloads: List[Optional[Dict]] = [None] * size
+        self.count = 0
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        q = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def lookup_exact(self, query: str, top_k: int) -> Optional[Dict]:
+        """Answer for the same question text, without needing an embedding"""
+        with self.lock:
+            return self.exact.get((normalize_query(query), top_k))
+
+    def lookup(self, vec, top_k: int) -> Optional[Dict]:
+        with self.lock:
+            if not self.count:
+                return None
+            q = self._normalize(vec)
+            if q.shape[0] != self.matrix.shape[1]:
+                return None
+            sims = cosine_scores(self.matrix[:self.count], q)
+            sims[self.top_k[:self.count] != top_k] = -1.0
+            sims[self.created[:self.count] < time.time() - self.ttl] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            return self.payloads[best]
+
+    def insert(self, vec, top_k: int, payload: Dict, created: Optional[float] = None, query: Optional[str] = None):
+        with self.lock:
+            if query is not None:
+                self.exact[(normalize_query(query), top_k)] = payload
+            q = self._normalize(vec)
+            if self.matrix is None or self.matrix.shape[1] != q.shape[0]:
+                self.matrix = np.zeros((self.size, q.shape[0]), dtype=np.float32)
+                self.count = 0
+                self.next_slot = 0
+            slot = self.next_slot  # overwrite the oldest entry once full
+            self.next_slot = (slot + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+            self.matrix[slot] = q
+            self.top_k[slot] = top_k
+            self.created[slot] = created or time.time()
+            self.payloads[slot] = payload
+
+    def clear(self):
+        """Forget all answers (the knowledge base or Q&A pairs changed)"""
+        with self.lock:
+            self.exact.clear()
+            self.count = 0
+            self.next_slot = 0
+            self.payloads = [None] * self.size
+
+    def save(self, path: str):
+        """Persist cached answers so they survive restarts"""
+        with self.lock:
+            rows = [
+                (self.matrix[i].tobytes(), int(self.top_k[i]), float(self.created[i]), json.dumps(self.payloads[i]))
+                for i in range(self.count)
+            ]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        con = sqlite3.connect(path)
+        con.execute("DROP TABLE IF EXISTS answer_cache")
+        con.execute("CREATE TABLE answer_cache (vec BLOB, top_k INTEGER, created REAL, payload TEXT)")
+        con.executemany("INSERT INTO answer_cache VALUES (?, ?, ?, ?)", rows)
+        con.commit()
+        con.close()
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return
+        con = sqlite3.connect(path)
+        try:
+            rows = con.execute(
+                "SELECT vec, top_k, created, payload FROM answer_cache WHERE created >= ? ORDER BY created",
+                (time.time() - self.ttl,)
+            ).fetchall()
+        finally:
+            con.close()
+        for vec, top_k, created, payload in rows[-self.size:]:
+            self.insert(np.frombuffer(vec, dtype=np.float32), top_k, json.loads(payload), created)
+
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_EXACT_CACHE_SIZE)
+
+@app.on_event("startup")
+def load_query_cache():
+    try:
+        answer_cache.load(QUERY_CACHE_DB)
+    except Exception as e:
+        print(f"Failed to load query cache: {e}")
+
+@app.on_event("shutdown")
+def save_query_cache():
+    embed_batcher.stop()
+    try:
+        answer_cache.save(QUERY_CACHE_DB)
+    except Exception as e:
+        print(f"Failed to save query cache: {e}")
+
+# Slug patterns and site-routing keywords, compiled once
+_SLUG_NONWORD = re.compile(r'[^\w\s-]')
+_SLUG_SEP = re.compile(r'[-\s]+')
+_ACADEMY_TERMS = frozenset({"academy", "ls", "print lab", "open studio", "creative cafe", "lightroom essentials",
+                            "mastering composition", "live session", "academy live"})
+_GENERIC_TERMS = frozenset({"photo", "lightroom", "print", "workshop", "landscape", "composition"})
+# Substring matches (e.g. "ls" inside "Details") are intentional; one alternation scans the title once
+_ACADEMY_RE = re.compile("|".join(re.escape(t) for t in sorted(_ACADEMY_TERMS, key=len, reverse=True)))
+_GENERIC_RE = re.compile("|".join(re.escape(t) for t in sorted(_GENERIC_TERMS, key=len, reverse=True)))
+
+def slugify(text: str) -> str:
+    """Convert title to URL slug"""
+    return _SLUG_SEP.sub('-', _SLUG_NONWORD.sub('', text.lower())).strip('-')
+
+@lru_cache(maxsize=4096)
 def generate_url_from_title(title: str, source: str = None, path: str = None) -> Optional[str]:
     """Generate URL from title and metadata if not provided"""
     if not title:
         return None
     
-    import re
-    
-    def slugify(text):
-        """Convert title to URL slug"""
-        slug = re.sub(r'[^\w\s-]', '', text.lower())
-        slug = re.sub(r'[-\s]+', '-', slug)
-        return slug.strip('-')
-    
     slug = slugify(title)
+    lowered = title.lower()
     
     # Determine site based on source or content
     if source == "blog-rrjr" or (path and "robertrodriguezjr" in path):
         return f"https://robertrodriguezjr.com/{slug}/"
     elif source == "blog-cpa" or (path and "creativepathworkshops" in path):
         return f"https://creativepathworkshops.com/{slug}/"
-    elif any(academy_term in title.lower() for academy_term in 
-        ["academy", "ls", "print lab", "open studio", "creative cafe", "lightroom essentials", 
-         "mastering composition", "live session", "academy live"]):
+    elif _ACADEMY_RE.search(lowered):
         # Academy content goes to creativepathworkshops.com
         return f"https://creativepathworkshops.com/{slug}/"
-    elif source in ["blog-rrjr", "upload"] or any(word in title.lower() for word in 
-        ["photo", "lightroom", "print", "workshop", "landscape", "composition"]):
+    elif source in ("blog-rrjr", "upload") or _GENERIC_RE.search(lowered):
         # Default to robertrodriguezjr.com for general photography content
         return f"https://robertrodriguezjr.com/{slug}/"
     
     return None
 
+def lookup_qa_pair(question: str):
+    """Return (answer, image_url) for an exact Q&A pair match, if any"""
+    cur = _db().execute("""
+        SELECT answer, image_url FROM qa_pairs 
+        WHERE question_norm = ?
+        LIMIT 1
+    """, (normalize_query(question),))
+    return cur.fetchone()
+
+class QAIndex:
+    """Embedded Q&A questions for paraphrase matching; rebuilt in the background after edits"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.matrix: Optional[np.ndarray] = None  # (N, dim) float32, unit rows
+        self.rows: List[tuple] = []  # (answer, image_url) per matrix row
+        self.stale = True
+        self.task: Optional[asyncio.Task] = None
+        self.retry_delay = QA_RETRY_BACKOFF
+        self.next_retry_at = 0.0  # time.monotonic() before which a failed build isn't retried
+
+    def mark_stale(self):
+        self.stale = True
+        self.retry_delay = QA_RETRY_BACKOFF
+        self.next_retry_at = 0.0
+
+    def schedule(self):
+        """Start a background rebuild if one is due; queries keep matching against the current index meanwhile"""
+        if not self.stale or time.monotonic() < self.next_retry_at:
+            return
+        if self.task is not None and not self.task.done():
+            return  # an edit during a build leaves stale set, so the next call rebuilds again
+        self.task = spawn(self.refresh())
+
+    async def refresh(self):
+        """Re-embed every stored question in batched calls; swap the index in only on success"""
+        self.stale = False
+        try:
+            rows = await asyncio.to_thread(lambda: _db().execute(
+                "SELECT question, answer, image_url FROM qa_pairs WHERE question != ''"
+            ).fetchall())
+            vecs = []
+            for start in range(0, len(rows), 256):
+                response = await client.embeddings.create(
+                    model=EMBED_MODEL,
+                    input=[row[0] for row in rows[start:start + 256]]
+                )
+                vecs.extend(d.embedding for d in response.data)
+            if not vecs:
+                self.matrix, self.rows = None, []
+            else:
+                matrix = np.asarray(vecs, dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                self.matrix, self.rows = matrix / norms, [(row[1], row[2]) for row in rows]
+            self.retry_delay = QA_RETRY_BACKOFF
+        except Exception as e:
+            self.stale = True
+            self.next_retry_at = time.monotonic() + self.retry_delay
+            print(f"Failed to build Q&A index (retrying in {self.retry_delay:g}s): {e!r}")
+            self.retry_delay = min(self.retry_delay * 2, QA_RETRY_MAX)
+
+    def match(self, vec: np.ndarray) -> Optional[tuple]:
+        """Return (answer, image_url) for the closest stored question above threshold"""
+        matrix = self.matrix
+        if matrix is None:
+            return None
+        q = np.asarray(vec, dtype=np.float32)
+        if q.shape[0] != matrix.shape[1]:
+            return None
+        scores = cosine_scores(matrix, q)
+        best = int(np.argmax(scores))
+        return self.rows[best] if scores[best] >= self.threshold else None
+
+qa_index = QAIndex(QA_MATCH_THRESHOLD)
+
+@app.on_event("startup")
+async def warm_qa_index():
+    qa_index.schedule()
+
+_last_indexed = {"value": None, "ts": 0.0}
+
+def get_last_indexed() -> Optional[str]:
+    """MAX(last_indexed) from documents, reused for INDEX_COUNT_TTL seconds (other processes write it too)"""
+    now = time.time()
+    if now - _last_indexed["ts"] > INDEX_COUNT_TTL:
+        row = _db().execute("SELECT MAX(last_indexed) FROM documents").fetchone()
+        _last_indexed.update(value=row[0] if row else None, ts=now)
+    return _last_indexed["value"]
+
+_vector_count = {"value": 0, "ts": 0.0}
+
+def get_vector_count(collection) -> int:
+    """collection.count(), reused for INDEX_COUNT_TTL seconds (dashboards poll /index-status)"""
+    now = time.time()
+    if now - _vector_count["ts"] > INDEX_COUNT_TTL:
+        _vector_count.update(value=collection.count(), ts=now)
+    return _vector_count["value"]
+
+def invalidate_index_status():
+    """The index changed: drop the cached last_indexed and vector count"""
+    _last_indexed["ts"] = 0.0
+    _vector_count["ts"] = 0.0
+
+# === Background Log Writer ===
+class LogWriter:
+    """Queue analytics rows and write them in batches, one transaction per batch"""
+
+    def __init__(self, batch_size: int = 100, flush_s: float = 1.0, max_pending: int = 10000):
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        # Bounded so a stalled disk can't grow memory without limit
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def put(self, sql: str, row: tuple):
+        if self.task is None or self.task.done():
+            # Not running inside the server loop (scripts, shutdown): write directly
+            self._write([(sql, row)])
+            return
+        try:
+            self.queue.put_nowait((sql, row))
+        except asyncio.QueueFull:
+            # Analytics are best-effort; never make a request wait on them
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"Log queue full, dropped {self.dropped} rows so far")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_s
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # None is the stop sentinel: write what was collected before it, then exit
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                await asyncio.to_thread(self._write, batch)
+            if stopping:
+                return
+
+    @staticmethod
+    def _write(batch):
+        grouped: Dict[str, List[tuple]] = {}
+        for sql, row in batch:
+            grouped.setdefault(sql, []).append(row)
+        con = _db()
+        try:
+            con.execute("BEGIN")
+            for sql, rows in grouped.items():
+                con.executemany(sql, rows)
+            con.execute("COMMIT")
+        except Exception as e:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            print(f"Failed to write {len(batch)} log rows: {e}")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        task, self.task = self.task, None  # rows put from here on are written directly
+        if not task.done():
+            await self.queue.put(None)
+            await task
+        pending = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        if pending:
+            self._write(pending)
+
+log_writer = LogWriter(max_pending=LOG_QUEUE_MAX)
+
+@app.on_event("startup")
+async def start_log_writer():
+    log_writer.start()
+
+async def _db_maintenance_loop():
+    while True:
+        await asyncio.sleep(DB_MAINTENANCE_INTERVAL)
+        try:
+            await asyncio.to_thread(db_maintenance)
+        except Exception as e:
+            print(f"Database maintenance failed: {e}")
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_db_maintenance():
+    global _maintenance_task
+    _maintenance_task = asyncio.get_running_loop().create_task(_db_maintenance_loop())
+
+@app.on_event("shutdown")
+async def stop_db_maintenance():
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+
+@app.on_event("startup")
+async def open_analytics_db():
+    await analytics_db()
+
+@app.on_event("shutdown")
+async def close_analytics_db():
+    global _analytics_db
+    if _analytics_db is not None:
+        await _analytics_db.close()
+        _analytics_db = None
+
+@app.on_event("shutdown")
+async def stop_log_writer():
+    await log_writer.stop()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+INSERT_QUERY_SQL = """
+    INSERT INTO query_logs (user_id, query, response_time, tokens_used)
+    VALUES (?, ?, ?, ?)
+"""
+
 def log_query(user_id: str, query: str, response_time: float, tokens_used: int = 0):
-    """Log a query for analytics"""
+    """Queue a query for analytics"""
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("""
-            INSERT INTO query_logs (user_id, query, response_time, tokens_used)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, query, response_time, tokens_used))
-        con.commit()
-        con.close()
+        log_writer.put(INSERT_QUERY_SQL, (user_id, query, response_time, tokens_used))
     except Exception as e:
         print(f"Failed to log query: {e}")
 
+INSERT_CHAT_SQL = """
+    INSERT INTO chats (ts, user_id, question, answer, sources_json, tokens_in, tokens_out, ms, cost_usd)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
 def log_chat(user_id: str, question: str, answer: str, sources: list, tokens_in: int, tokens_out: int, response_time_ms: int, cost_usd: float = 0.0):
-    """Log a chat interaction to the chats table for user analytics"""
+    """Queue a chat interaction for the chats table (user analytics)"""
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        
         # Convert sources to JSON string
-        sources_json = json.dumps([{
+        sources_json = orjson.dumps([{
             "title": src.title,
             "url": src.url,
             "source": src.source
-        } for src in sources]) if sources else "[]"
+        } for src in sources]).decode() if sources else "[]"
         
-        cur.execute("""
-            INSERT INTO chats (ts, user_id, question, answer, sources_json, tokens_in, tokens_out, ms, cost_usd)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        log_writer.put(INSERT_CHAT_SQL, (
             datetime.now().isoformat() + "Z",
             user_id or "",
             question,
@@ -343,163 +1357,281 @@ def log_chat(user_id: str, question: str, answer: str, sources: list, tokens_in:
             response_time_ms,
             cost_usd
         ))
-        con.commit()
-        con.close()
     except Exception as e:
         print(f"Failed to log chat: {e}")
 
-# === Original Endpoints ===
-@app.post("/query", response_model=QueryOut)
-async def query(data: QueryIn):
-    """Query the knowledge base"""
-    start_time = time.time()
-    collection = get_collection()
+# === Query Pipeline ===
+async def log_interaction(data: QueryIn, answer: str, sources: List[Source], start_time: float,
+                          tokens_in: float, tokens_out: float, tokens_used: int = 0):
+    """Log a query to both analytics tables"""
+    response_time = time.time() - start_time
+    log_query(data.user_id or "anonymous", data.query, response_time, tokens_used)
+    log_chat(
+        user_id=data.user_id or "",
+        question=data.query,
+        answer=answer,
+        sources=sources,
+        tokens_in=tokens_in,
+        tokens_out=tokens_out,
+        response_time_ms=int(response_time * 1000),
+        cost_usd=0.0  # Calculate if needed
+    )
+
+async def qa_answer(data: QueryIn, qa_result: tuple, start_time: float) -> QueryOut:
+    """Format and log a stored Q&A answer"""
+    answer_text = qa_result[0]
+    image_url = qa_result[1]
+    
+    # Add image to answer if available
+    if image_url:
+        answer_text += f"\n\n![Instructional Image]({image_url})"
+    
+    await log_interaction(
+        data, answer_text, [], start_time,
+        tokens_in=len(data.query.split()) * 1.3,  # Rough estimate
+        tokens_out=len(answer_text.split()) * 1.3  # Rough estimate
+    )
+    return QueryOut(answer=answer_text, sources=[])
+
+async def prepare_query(data: QueryIn, start_time: float) -> Dict[str, Any]:
+    """Run everything before the LLM call.
+
+    Returns {"answer": QueryOut} when the query can be answered directly,
+    otherwise the embedding, sources, prompt messages and top score.
+    """
+    # Cached handle needs no thread hop; only a cold lookup goes to Chroma
+    collection = _collection or await asyncio.to_thread(get_collection)
     
     if not collection:
-        return QueryOut(
+        return {"answer": QueryOut(
             answer="The knowledge base has not been indexed yet. Please run the indexer first.",
             sources=[]
-        )
+        )}
     
-    try:
-        # Check Q&A pairs first
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("""
-            SELECT answer, image_url FROM qa_pairs 
-            WHERE LOWER(question) = LOWER(?)
-            LIMIT 1
-        """, (data.query,))
-        qa_result = cur.fetchone()
-        con.close()
-        
-        if qa_result:
-            response_time = time.time() - start_time
-            response_time_ms = int(response_time * 1000)
-            
-            answer_text = qa_result[0]
-            image_url = qa_result[1]
-            
-            # Add image to answer if available
-            if image_url:
-                answer_text += f"\n\n![Instructional Image]({image_url})"
-            
-            # Log to both tables for analytics
-            log_query(data.user_id or "anonymous", data.query, response_time)
-            log_chat(
-                user_id=data.user_id or "",
-                question=data.query,
-                answer=answer_text,
-                sources=[],
-                tokens_in=len(data.query.split()) * 1.3,  # Rough estimate
-                tokens_out=len(answer_text.split()) * 1.3,  # Rough estimate
-                response_time_ms=response_time_ms,
-                cost_usd=0.0
-            )
-            
-            return QueryOut(answer=answer_text, sources=[])
-        
-        # Regular ChromaDB search
-        query_embedding = embed_query(data.query)
-        results = collection.query(
-            query_embeddings=[query_embedding],
+    # Same question answered recently? (cleared whenever Q&A pairs or the index change)
+    cached = None if data.no_cache else answer_cache.lookup_exact(data.query, data.top_k)
+    if cached:
+        cached_out = QueryOut(**cached)
+        await log_interaction(data, cached_out.answer, cached_out.sources, start_time, tokens_in=0, tokens_out=0)
+        return {"answer": cached_out}
+    
+    # Start embedding while the Q&A table is checked; a hit cancels it
+    embed_task = asyncio.create_task(embed_query_cached(data.query))
+    qa_result = await asyncio.to_thread(lookup_qa_pair, data.query)
+    
+    if qa_result:
+        if not embed_task.cancel():
+            embed_task.exception()  # already finished; mark any error as retrieved
+        return {"answer": await qa_answer(data, qa_result, start_time)}
+    
+    # Regular ChromaDB search
+    query_embedding = await embed_task
+
+    # Paraphrase of a stored Q&A question?
+    qa_index.schedule()
+    qa_result = qa_index.match(query_embedding)
+    if qa_result:
+        return {"answer": await qa_answer(data, qa_result, start_time)}
+
+    # Near-duplicate question answered recently?
+    cached = None if data.no_cache else answer_cache.lookup(query_embedding, data.top_k)
+    if cached:
+        cached_out = QueryOut(**cached)
+        await log_interaction(data, cached_out.answer, cached_out.sources, start_time, tokens_in=0, tokens_out=0)
+        return {"answer": cached_out}
+
+    results = None
+    if KB_MEMORY_INDEX:
+        results = await asyncio.to_thread(memory_index.search, collection, query_embedding, data.top_k)
+    if results is None:
+        results = await asyncio.to_thread(
+            collection.query,
+            query_embeddings=[query_embedding.tolist()],
             n_results=data.top_k,
             include=["documents", "metadatas", "distances"]
         )
-        
-        if not results["documents"] or not results["documents"][0]:
-            return QueryOut(
-                answer="I couldn't find any relevant information in the knowledge base for your query.",
-                sources=[]
+        results["distances"] = cosine_distances(collection, results.get("distances") or [[]])
+    
+    if not results["documents"] or not results["documents"][0]:
+        return {"answer": QueryOut(
+            answer="I couldn't find any relevant information in the knowledge base for your query.",
+            sources=[]
+        )}
+    
+    contexts = []
+    sources: List[Source] = []
+    seen_docs = set()
+    
+    # Results come back best-first; keep what fits the prompt budget
+    documents, metadatas = results["documents"][0], results["metadatas"][0]
+    distances = (results.get("distances") or [[]])[0]
+    for i in select_context(documents, distances, KB_MAX_PROMPT_TOKENS):
+        doc, metadata = documents[i], metadatas[i]
+        contexts.append(metadata.get("meta_block", "") + doc)
+        # One source per document; distinct documents may share a title
+        doc_key = metadata.get("doc_id") or metadata.get("title", "Unknown")
+        if doc_key in seen_docs:
+            continue
+        seen_docs.add(doc_key)
+        title = metadata.get("title", "Unknown")
+        
+        # Get URL from metadata or generate it
+        url = metadata.get("url")
+        if not url:
+            url = generate_url_from_title(
+                title, 
+                metadata.get("source"), 
+                metadata.get("path")
             )
         
-        contexts = []
-        sources_dict = {}
-        
-        for doc, metadata in zip(results["documents"][0], results["metadatas"][0]):
-            contexts.append(doc)
-            title = metadata.get("title", "Unknown")
-            if title not in sources_dict:
-                # Get URL from metadata or generate it
-                url = metadata.get("url")
-                if not url:
-                    url = generate_url_from_title(
-                        title, 
-                        metadata.get("source"), 
-                        metadata.get("path")
-                    )
-                
-                sources_dict[title] = Source(
-                    title=title,
-                    path=metadata.get("path"),
-                    url=url,
-                    source=metadata.get("source", "doc")
-                )
-        
-        context_text = "\n\n---\n\n".join(contexts[:data.top_k])
-        
-        # Use a default style guide if prompts module isn't available
-        try:
-            from prompts import STYLE_GUIDE
-        except ImportError:
-            try:
-                from app.prompts import STYLE_GUIDE
-            except ImportError:
-                # Fallback style guide
-                STYLE_GUIDE = """
-You are Robert Rodriguez Jr's Academy Assistant. Tone: clear, practical, encouraging.
-Answer ONLY from provided context. If missing, say you don't know and suggest the closest lesson.
-Format:
-1) Summary (3–6 sentences)
-2) How to apply (bulleted steps)
-3) Sources (title + deep link + timestamp/page if present)
-Keep citations precise.
-"""
-        system_prompt = STYLE_GUIDE
-        user_prompt = f"""Question: {data.query}
+        # Fields come straight from our own metadata; skip re-validation
+        sources.append(Source.model_construct(
+            title=title,
+            path=metadata.get("path"),
+            url=url,
+            source=metadata.get("source", "doc")
+        ))
+    
+    context_text = "\n\n---\n\n".join(contexts)
+    
+    user_prompt = USER_PROMPT_TEMPLATE.format(query=data.query, context=context_text)
 
-Context from Academy Knowledge Base:
-{context_text}
+    return {
+        "embedding": query_embedding,
+        "sources": sources,
+        "messages": [
+            {"role": "system", "content": STYLE_GUIDE},
+            {"role": "user", "content": user_prompt}
+        ],
+        "top_score": round(1.0 - distances[0], 4) if distances else None,
+    }
 
-Provide an answer following the format guidelines (summary, how to apply, sources)."""
+# === Original Endpoints ===
+@app.post("/query", response_model=QueryOut)
+async def query(data: QueryIn):
+    """Query the knowledge base"""
+    start_time = time.time()
+    
+    try:
+        prepared = await prepare_query(data, start_time)
+        if "answer" in prepared:
+            return prepared["answer"]
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        response = await client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=prepared["messages"],
             temperature=0.7,
             max_tokens=500
         )
         
         answer = response.choices[0].message.content
-        response_time = time.time() - start_time
-        response_time_ms = int(response_time * 1000)
-        
-        # Log to both tables for analytics
-        log_query(data.user_id or "anonymous", data.query, response_time, 500)
-        log_chat(
-            user_id=data.user_id or "",
-            question=data.query,
-            answer=answer,
-            sources=list(sources_dict.values()),
+        sources = prepared["sources"]
+        
+        await log_interaction(
+            data, answer, sources, start_time,
             tokens_in=len(data.query.split()) * 1.3,  # Rough estimate
             tokens_out=500,  # Max tokens used
-            response_time_ms=response_time_ms,
-            cost_usd=0.0  # Calculate if needed
+            tokens_used=500
         )
         
-        return QueryOut(answer=answer, sources=list(sources_dict.values()))
+        result = QueryOut(answer=answer, sources=sources)
+        answer_cache.insert(prepared["embedding"], data.top_k, result.model_dump(), query=data.query)
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Query error: {e}")
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
+def _sse(payload: Dict[str, Any]) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+@app.post("/query/stream")
+async def query_stream(data: QueryIn):
+    """Query the knowledge base, streaming the answer as server-sent events.
+
+    Events: {"type": "sources", ...} first, then {"type": "delta", "delta": ...}
+    as tokens arrive, then {"type": "done"} (or {"type": "error"}).
+    """
+    start_time = time.time()
+    
+    try:
+        prepared = await prepare_query(data, start_time)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Query error: {e}")
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+    async def events():
+        if "answer" in prepared:
+            out = prepared["answer"]
+            yield _sse({"type": "sources", "sources": [s.model_dump() for s in out.sources], "top_score": None})
+            yield _sse({"type": "delta", "delta": out.answer})
+            yield _sse({"type": "done"})
+            return
+
+        sources = prepared["sources"]
+        yield _sse({"type": "sources", "sources": [s.model_dump() for s in sources], "top_score": prepared["top_score"]})
+
+        parts = []
+        usage = None
+        try:
+            stream = await client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=prepared["messages"],
+                temperature=0.7,
+                max_tokens=500,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage  # final chunk, no choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    parts.append(delta)
+                    yield _sse({"type": "delta", "delta": delta})
+        except Exception as e:
+            print(f"Stream error: {e}")
+            yield _sse({"type": "error", "detail": "Query failed"})
+            return
+
+        answer = "".join(parts)
+        await log_interaction(
+            data, answer, sources, start_time,
+            tokens_in=usage.prompt_tokens if usage else len(data.query.split()) * 1.3,  # Rough estimate without usage
+            tokens_out=usage.completion_tokens if usage else len(parts),
+            tokens_used=usage.total_tokens if usage else len(parts)
+        )
+        answer_cache.insert(prepared["embedding"], data.top_k, QueryOut(answer=answer, sources=sources).model_dump(), query=data.query)
+        yield _sse({"type": "done"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def etag_response(request: Request, payload: Dict) -> Response:
+    """JSON response with an ETag; 304 with no body when the client already has this payload"""
+    body = orjson.dumps(payload)
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 @app.get("/index-status")
-async def index_status():
-    """Get the status of the vector index"""
-    collection = get_collection()
+async def index_status_endpoint(request: Request):
+    """Get the status of the vector index (ETag'd so pollers can revalidate cheaply)"""
+    return etag_response(request, await index_status())
+
+async def index_status() -> Dict:
+    """Status of the vector index"""
+    collection = _collection or await asyncio.to_thread(get_collection)
     
     if not collection:
         return {
@@ -509,13 +1641,8 @@ async def index_status():
         }
     
     try:
-        count = collection.count()
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("SELECT MAX(last_indexed) FROM documents")
-        result = cur.fetchone()
-        con.close()
-        last_indexed = result[0] if result else None
+        count = await asyncio.to_thread(get_vector_count, collection)
+        last_indexed = await asyncio.to_thread(get_last_indexed)
         
         return {
             "vector_count": count,
@@ -529,29 +1656,137 @@ async def index_status():
             "status": f"Error: {str(e)}"
         }
 
-@app.post("/reindex")
-async def reindex(request: Request):
-    """Trigger a reindex of the knowledge base"""
-    _require_admin(request)
+def _insert_reindex_run() -> int:
+    now = datetime.now().isoformat() + "Z"
+    return _db().execute(
+        "INSERT INTO reindex_progress (started_at, updated_at, status) VALUES (?, ?, 'running')",
+        (now, now)
+    ).lastrowid
+
+async def start_reindex() -> Optional[int]:
+    """Start a background reindex; returns its reindex_progress id, or None if one is already running"""
+    if not _reindex_lock.acquire(blocking=False):
+        return None
+    try:
+        run_id = await asyncio.to_thread(_insert_reindex_run)
+    except Exception:
+        _reindex_lock.release()
+        raise
 
     def _run():
+        con = _db()
+
+        def progress(files_done: int, files_total: int, chunks: int):
+            con.execute("""
+                UPDATE reindex_progress SET updated_at = ?, files_done = ?, files_total = ?, chunks = ?
+                WHERE id = ?
+            """, (datetime.now().isoformat() + "Z", files_done, files_total, chunks, run_id))
+
+        status, message = "completed", None
         try:
-            script_path = BASE_DIR / "scripts" / "build_index.py"
-            subprocess.run(
-                [sys.executable, str(script_path)],
-                cwd=str(BASE_DIR),
-                check=True,
-                capture_output=True,
-                text=True
-            )
+            try:
+                indexer = load_indexing_module()
+            except Exception as e:
+                print(f"Could not load indexer in-process ({e!r}); running it as a subprocess")
+                indexer = None
+            if indexer is not None:
+                # Run in-process: no interpreter startup or re-import of chromadb/openai
+                indexer.main([], progress=progress)
+            else:
+                # Output goes straight to our stdout rather than being buffered in memory
+                subprocess.run(
+                    [sys.executable, str(BASE_DIR / "scripts" / "build_index.py")],
+                    cwd=str(BASE_DIR),
+                    check=True
+                )
             print("Reindex completed successfully")
-        except subprocess.CalledProcessError as e:
-            print(f"Reindex failed: {e.stderr}")
         except Exception as e:
+            status, message = "error", repr(e)
             print(f"Reindex error: {repr(e)}")
+        finally:
+            con.execute(
+                "UPDATE reindex_progress SET updated_at = ?, status = ?, message = ? WHERE id = ?",
+                (datetime.now().isoformat() + "Z", status, message, run_id)
+            )
+            reset_collection_cache()
+            clear_embed_cache()
+            answer_cache.clear()
+            memory_index.mark_stale()
+            invalidate_index_status()
+            _reindex_lock.release()
 
     threading.Thread(target=_run, daemon=True).start()
-    return {"status": "started", "message": "Reindexing in background"}
+    return run_id
+
+@app.post("/reindex")
+async def reindex(request: Request):
+    """Trigger a reindex of the knowledge base"""
+    _require_admin(request)
+
+    job_id = await start_reindex()
+    if job_id is None:
+        return {"status": "running", "message": "A reindex is already in progress"}
+    return {"status": "started", "message": "Reindexing in background", "job_id": job_id}
+
+async def latest_reindex_run() -> Dict:
+    """Progress of the most recent reindex run"""
+    con = await analytics_db()
+    cur = await con.execute("""
+        SELECT started_at, updated_at, status, files_done, files_total, chunks, message
+        FROM reindex_progress
+        ORDER BY id DESC
+        LIMIT 1
+    """)
+    row = await cur.fetchone()
+    await cur.close()
+    if not row:
+        return {"status": "never_run"}
+    
+    return {
+        "status": row[2],
+        "started_at": row[0],
+        "updated_at": row[1],
+        "files_done": row[3],
+        "files_total": row[4],
+        "chunks": row[5],
+        "message": row[6]
+    }
+
+@app.get("/admin/reindex-status")
+async def reindex_status(request: Request):
+    """Progress of the most recent reindex run"""
+    _require_admin(request)
+    return etag_response(request, await latest_reindex_run())
+
+@app.get("/admin/reindex-events")
+async def reindex_events(request: Request):
+    """Server-sent progress for the most recent reindex run.
+
+    Emits a "progress" event whenever the run's row changes and a final "done"
+    event once it stops running, so clients hold one connection instead of polling.
+    """
+    _require_admin(request)
+
+    async def events():
+        last, quiet_since = None, time.monotonic()
+        while not await request.is_disconnected():
+            run = await latest_reindex_run()
+            if run != last:
+                last, quiet_since = run, time.monotonic()
+                if run["status"] != "running":
+                    yield _sse({"type": "done", **run})
+                    return
+                yield _sse({"type": "progress", **run})
+            elif time.monotonic() - quiet_since >= REINDEX_EVENTS_KEEPALIVE:
+                quiet_since = time.monotonic()
+                yield b": keep-alive\n\n"
+            await asyncio.sleep(REINDEX_EVENTS_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # === New Dashboard Endpoints ===
 
@@ -561,15 +1796,14 @@ async def get_documents(request: Request):
     _require_admin(request)
     
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("""
+        con = await analytics_db()
+        cur = await con.execute("""
             SELECT doc_id, title, path, chunk_count, last_indexed, status
             FROM documents
             ORDER BY last_indexed DESC
         """)
-        rows = cur.fetchall()
-        con.close()
+        rows = await cur.fetchall()
+        await cur.close()
         
         documents = []
         for row in rows:
@@ -594,75 +1828,67 @@ async def delete_document(doc_id: str, request: Request):
     
     try:
         # Remove from ChromaDB
-        collection = get_collection()
+        collection = _collection or await asyncio.to_thread(get_collection)
         if collection:
             # Delete all chunks for this document
-            collection.delete(where={"doc_id": doc_id})
+            await asyncio.to_thread(collection.delete, where={"doc_id": doc_id})
+            memory_index.mark_stale()
+            answer_cache.clear()
         
         # Remove from database
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
-        con.commit()
-        con.close()
+        await db_execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        invalidate_index_status()
         
         return {"status": "deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+_metrics_snapshot: Dict[str, Any] = {"ts": 0.0, "data": None}
+
 @app.get("/admin/metrics")
 async def get_metrics(request: Request):
-    """Get usage metrics for the dashboard"""
+    """Get usage metrics for the dashboard (aggregates are recomputed at most every METRICS_CACHE_TTL seconds)"""
     _require_admin(request)
     
+    if _metrics_snapshot["data"] is not None and time.time() - _metrics_snapshot["ts"] < METRICS_CACHE_TTL:
+        return {**_metrics_snapshot["data"], "embedding_cache": embed_cache_info()}
+    
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
+        con = await analytics_db()
+        cur = await con.cursor()
         
-        # Get today's queries from chats table
+        # ts is stored as ISO-8601, so half-open string ranges compare correctly
         today = datetime.now().strftime('%Y-%m-%d')
-        cur.execute("""
-            SELECT COUNT(*) FROM chats 
-            WHERE DATE(ts) = ?
-        """, (today,))
-        queries_today = cur.fetchone()[0]
-        
-        # Get this week's queries
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
         week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        cur.execute("""
-            SELECT COUNT(*) FROM chats 
-            WHERE DATE(ts) >= ?
-        """, (week_ago,))
-        queries_week = cur.fetchone()[0]
         
-        # Get total queries
-        cur.execute("SELECT COUNT(*) FROM chats")
-        total_queries = cur.fetchone()[0]
-        
-        # Get active users (count distinct user_ids, treat empty as anonymous)
-        cur.execute("""
-            SELECT COUNT(DISTINCT CASE WHEN user_id = '' THEN id ELSE user_id END) FROM chats 
-            WHERE DATE(ts) = ?
-        """, (today,))
-        active_users = cur.fetchone()[0]
-        
-        # Get average response time from ms column
-        cur.execute("SELECT AVG(ms) FROM chats WHERE ms > 0")
-        avg_response_time = cur.fetchone()[0] or 0
-        avg_response_time = avg_response_time / 1000  # Convert ms to seconds
+        # Today/week/total counts, today's active users (empty user_id = one anonymous
+        # session per row) and average response time, all in one pass over chats
+        await cur.execute("""
+            SELECT
+                COALESCE(SUM(ts >= ? AND ts < ?), 0),
+                COALESCE(SUM(ts >= ?), 0),
+                COUNT(*),
+                COUNT(DISTINCT CASE WHEN ts >= ? AND ts < ? THEN
+                    CASE WHEN user_id = '' THEN id ELSE user_id END END),
+                AVG(CASE WHEN ms > 0 THEN ms END)
+            FROM chats
+        """, (today, tomorrow, week_ago, today, tomorrow))
+        queries_today, queries_week, total_queries, active_users, avg_response_time = await cur.fetchone()
+        avg_response_time = (avg_response_time or 0) / 1000  # Convert ms to seconds
         
         # Get daily usage for chart
-        cur.execute("""
+        await cur.execute("""
             SELECT DATE(ts) as date, COUNT(*) as count
             FROM chats
-            WHERE DATE(ts) >= ?
+            WHERE ts >= ?
             GROUP BY DATE(ts)
             ORDER BY date
         """, (week_ago,))
-        daily_usage = [{"date": row[0], "count": row[1]} for row in cur.fetchall()]
+        daily_usage = [{"date": row[0], "count": row[1]} for row in await cur.fetchall()]
         
         # Get popular topics from questions
-        cur.execute("""
+        await cur.execute("""
             SELECT question, COUNT(*) as count
             FROM chats
             WHERE question IS NOT NULL AND question != ''
@@ -670,11 +1896,11 @@ async def get_metrics(request: Request):
             ORDER BY count DESC
             LIMIT 10
         """)
-        popular_topics = [{"topic": row[0][:50] + "..." if len(row[0]) > 50 else row[0], "count": row[1]} for row in cur.fetchall()]
+        popular_topics = [{"topic": row[0][:50] + "..." if len(row[0]) > 50 else row[0], "count": row[1]} for row in await cur.fetchall()]
         
-        con.close()
+        await cur.close()
         
-        return {
+        data = {
             "total_queries": total_queries,
             "queries_today": queries_today,
             "queries_week": queries_week,
@@ -684,6 +1910,8 @@ async def get_metrics(request: Request):
             "popular_topics": popular_topics,
             "messages_sent": total_queries
         }
+        _metrics_snapshot.update(ts=time.time(), data=data)
+        return {**data, "embedding_cache": embed_cache_info()}
     except Exception as e:
         print(f"Error fetching metrics: {e}")
         return {
@@ -697,162 +1925,112 @@ async def get_metrics(request: Request):
             "messages_sent": 0
         }
 
+# Checked in order; the first term contained in a question names its topic
+TOPIC_TERMS = ('lightroom', 'photoshop', 'composition', 'printing', 'paper', 'editing', 'exposure', 'portrait', 'landscape', 'business', 'marketing', 'workflow')
+_TOPIC_CASE_SQL = "CASE " + " ".join("WHEN question LIKE ? THEN ?" for _ in TOPIC_TERMS) + " ELSE LOWER(TRIM(question)) END"
+_TOPIC_CASE_PARAMS = tuple(p for term in TOPIC_TERMS for p in (f"%{term}%", term))
+
 @app.get("/admin/user-analytics")
 async def get_user_analytics(request: Request):
     """Get comprehensive user analytics for the Users dashboard"""
     _require_admin(request)
     
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        
-        # Get total users (count distinct user_ids, treat all anonymous as 1 user)
-        cur.execute("""
-            SELECT COUNT(DISTINCT user_id) FROM chats WHERE user_id != '' AND user_id IS NOT NULL
-        """)
-        identified_users = cur.fetchone()[0]
+        con = await analytics_db()
+        cur = await con.cursor()
         
-        # Check if there are any anonymous sessions (empty/null user_id)
-        cur.execute("""
-            SELECT COUNT(*) FROM chats WHERE user_id = '' OR user_id IS NULL
-        """)
-        anonymous_sessions = cur.fetchone()[0]
+        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        today = datetime.now().strftime('%Y-%m-%d')
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        # All scalar stats in one pass over chats (plus one per-user rollup)
+        await cur.execute("""
+            WITH per_user AS (
+                SELECT user_id,
+                       COUNT(*) AS question_count,
+                       COUNT(DISTINCT DATE(ts)) AS days_active
+                FROM chats
+                WHERE user_id != '' AND user_id IS NOT NULL
+                GROUP BY user_id
+            ),
+            totals AS (
+                SELECT
+                    COUNT(DISTINCT CASE WHEN user_id != '' THEN user_id END) AS identified_users,
+                    COALESCE(SUM(CASE WHEN user_id = '' OR user_id IS NULL THEN 1 ELSE 0 END), 0) AS anonymous_sessions,
+                    COUNT(DISTINCT CASE WHEN ts >= ? AND user_id != '' THEN user_id END) AS identified_active_users,
+                    COALESCE(SUM(CASE WHEN ts >= ? AND (user_id = '' OR user_id IS NULL) THEN 1 ELSE 0 END), 0) AS anonymous_active_sessions,
+                    COALESCE(SUM(CASE WHEN ts >= ? AND ts < ? AND question IS NOT NULL AND question != '' THEN 1 ELSE 0 END), 0) AS questions_today,
+                    AVG(CASE WHEN ms > 0 THEN ms END) AS avg_ms
+                FROM chats
+            )
+            SELECT totals.*,
+                   (SELECT COUNT(*) FROM per_user WHERE question_count > 1) AS engaged_users,
+                   (SELECT AVG(question_count) FROM per_user) AS avg_questions,
+                   (SELECT COUNT(*) FROM per_user WHERE days_active > 1) AS returning_users
+            FROM totals
+        """, (week_ago, week_ago, today, tomorrow))
+        (identified_users, anonymous_sessions, identified_active_users, anonymous_active_sessions,
+         questions_today, avg_response_ms, engaged_users, avg_questions_result, returning_users) = await cur.fetchone()
         
         # Total users = identified users + 1 if there are anonymous sessions
         total_users = identified_users + (1 if anonymous_sessions > 0 else 0)
         
-        # Get active users this week (same logic as total users)
-        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        cur.execute("""
-            SELECT COUNT(DISTINCT user_id) FROM chats 
-            WHERE DATE(ts) >= ? AND user_id != '' AND user_id IS NOT NULL
-        """, (week_ago,))
-        identified_active_users = cur.fetchone()[0]
-        
-        # Check if there are any anonymous sessions this week
-        cur.execute("""
-            SELECT COUNT(*) FROM chats 
-            WHERE DATE(ts) >= ? AND (user_id = '' OR user_id IS NULL)
-        """, (week_ago,))
-        anonymous_active_sessions = cur.fetchone()[0]
-        
         # Active users = identified users + 1 if there are anonymous sessions this week
         active_users_week = identified_active_users + (1 if anonymous_active_sessions > 0 else 0)
         
-        # Get questions asked today
-        today = datetime.now().strftime('%Y-%m-%d')
-        cur.execute("""
-            SELECT COUNT(*) FROM chats 
-            WHERE DATE(ts) = ? AND question IS NOT NULL AND question != ''
-        """, (today,))
-        questions_today = cur.fetchone()[0]
-        
-        # Calculate engagement rate (users who ask multiple questions)
-        cur.execute("""
-            SELECT COUNT(*) FROM (
-                SELECT user_id, COUNT(*) as question_count
-                FROM chats 
-                WHERE user_id != '' AND user_id IS NOT NULL
-                GROUP BY user_id
-                HAVING question_count > 1
-            )
-        """)
-        engaged_users = cur.fetchone()[0]
+        # Engagement rate (users who ask multiple questions)
         engagement_rate = round((engaged_users / max(total_users, 1)) * 100, 1) if total_users > 0 else 0
         
         # Get user activity over time (last 30 days) - simplified for current data
         thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        cur.execute("""
+        await cur.execute("""
             SELECT DATE(ts) as date, 1 as count
             FROM chats
-            WHERE DATE(ts) >= ?
+            WHERE ts >= ?
             GROUP BY DATE(ts)
             ORDER BY date
         """, (thirty_days_ago,))
-        user_activity = [{"date": row[0], "count": 1} for row in cur.fetchall()]
+        user_activity = [{"date": row[0], "count": 1} for row in await cur.fetchall()]
         
-        # Get popular topics from questions (extract keywords)
-        cur.execute("""
-            SELECT question, COUNT(*) as count
+        # Popular topics: SQLite buckets questions by photography term in one pass;
+        # anything unmatched falls back to its first two words
+        await cur.execute(f"""
+            SELECT {_TOPIC_CASE_SQL} AS topic, COUNT(*) AS count
             FROM chats
             WHERE question IS NOT NULL AND question != ''
-            GROUP BY LOWER(question)
+            GROUP BY topic
             ORDER BY count DESC
-            LIMIT 10
-        """)
-        popular_topics = []
-        photography_terms = ['lightroom', 'photoshop', 'composition', 'printing', 'paper', 'editing', 'exposure', 'portrait', 'landscape', 'business', 'marketing', 'workflow']
-        
-        for row in cur.fetchall():
-            question = row[0].lower()
-            # Extract key photography terms
-            found_topic = None
-            for term in photography_terms:
-                if term in question:
-                    found_topic = term.title()
-                    break
-            
-            if not found_topic:
-                # Fallback to first few words
-                words = question.split()[:2]
-                found_topic = " ".join(words).title()
-            
-            popular_topics.append({"topic": found_topic, "count": row[1]})
-        
-        # Aggregate similar topics
-        topic_counts = {}
-        for item in popular_topics:
-            topic = item["topic"]
-            if topic in topic_counts:
-                topic_counts[topic] += item["count"]
-            else:
-                topic_counts[topic] = item["count"]
+            LIMIT 50
+        """, _TOPIC_CASE_PARAMS)
+        topic_counts: Dict[str, int] = {}
+        for topic, count in await cur.fetchall():
+            topic = " ".join(topic.split()[:2]).title()
+            topic_counts[topic] = topic_counts.get(topic, 0) + count
         
         popular_topics = [{"topic": topic, "count": count} for topic, count in sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)][:5]
         
         # Get usage patterns
-        cur.execute("""
+        await cur.execute("""
             SELECT strftime('%H', ts) as hour, COUNT(*) as count
             FROM chats
             GROUP BY hour
             ORDER BY count DESC
             LIMIT 1
         """)
-        peak_hour_result = cur.fetchone()
+        peak_hour_result = await cur.fetchone()
         peak_hour = f"{peak_hour_result[0]}:00-{int(peak_hour_result[0])+1}:00" if peak_hour_result else "N/A"
         
         # Average session length (estimate based on response times)
-        cur.execute("SELECT AVG(ms) FROM chats WHERE ms > 0")
-        avg_response_ms = cur.fetchone()[0] or 0
+        avg_response_ms = avg_response_ms or 0
         avg_session_minutes = round((avg_response_ms / 1000) / 60 * 2.5, 1) if avg_response_ms > 0 else 0
         
-        # Questions per session (average)
-        cur.execute("""
-            SELECT AVG(question_count) FROM (
-                SELECT user_id, COUNT(*) as question_count
-                FROM chats 
-                WHERE user_id != '' AND user_id IS NOT NULL
-                GROUP BY user_id
-            )
-        """)
-        avg_questions_result = cur.fetchone()[0]
+        # Questions per session (average) and return rate (users who come back)
         avg_questions_per_session = round(avg_questions_result, 1) if avg_questions_result else 1.0
         
-        # Return rate (users who come back)
-        cur.execute("""
-            SELECT COUNT(*) FROM (
-                SELECT user_id, COUNT(DISTINCT DATE(ts)) as days_active
-                FROM chats 
-                WHERE user_id != '' AND user_id IS NOT NULL
-                GROUP BY user_id
-                HAVING days_active > 1
-            )
-        """)
-        returning_users = cur.fetchone()[0]
         return_rate = round((returning_users / max(total_users, 1)) * 100) if total_users > 0 else 0
         
         # Recent activity (last 10 interactions)
-        cur.execute("""
+        await cur.execute("""
             SELECT ts, question, user_id
             FROM chats 
             WHERE question IS NOT NULL AND question != ''
@@ -860,7 +2038,7 @@ async def get_user_analytics(request: Request):
             LIMIT 10
         """)
         recent_activity = []
-        for row in cur.fetchall():
+        for row in await cur.fetchall():
             ts, question, user_id = row
             # Parse timestamp and make it relative
             try:
@@ -889,7 +2067,7 @@ async def get_user_analytics(request: Request):
                     "user": "Anonymous"
                 })
         
-        con.close()
+        await cur.close()
         
         return {
             "total_users": total_users,
@@ -935,19 +2113,35 @@ async def add_text_training(data: TextTrainingIn, request: Request):
     """Add text training data"""
     _require_admin(request)
     
+    if not data.content.strip():
+        raise HTTPException(status_code=400, detail="Content is empty")
+    
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("""
+        training_id = await asyncio.to_thread(lambda: _db().execute("""
             INSERT INTO text_training (content, character_count)
             VALUES (?, ?)
-        """, (data.content, len(data.content)))
-        con.commit()
-        con.close()
+        """, (data.content, len(data.content))).lastrowid)
+        
+        # Indexed like an uploaded .md file so it is chunked, embedded and tracked the same way
+        upload_dir = BASE_DIR / "data" / "uploads"
+        upload_dir.mkdir(exist_ok=True, parents=True)
+        filename = f"text-training-{training_id}.md"
+        file_path = upload_dir / filename
+        await asyncio.to_thread(file_path.write_text, data.content, encoding="utf-8")
         
-        # TODO: Actually index this content into ChromaDB
+        result = await asyncio.to_thread(index_single_file, str(file_path), filename)
+        uploads_changed()
+        if result["status"] == "error":
+            raise HTTPException(status_code=500, detail=f"Indexing failed: {result['message']}")
         
-        return {"status": "saved", "characters": len(data.content)}
+        return {
+            "status": "saved",
+            "characters": len(data.content),
+            "doc_id": result["doc_id"],
+            "chunks": result["chunks"]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -957,15 +2151,14 @@ async def get_qa_pairs(request: Request):
     _require_admin(request)
     
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("""
+        con = await analytics_db()
+        cur = await con.execute("""
             SELECT id, question, answer, image_url, created_at, used_count
             FROM qa_pairs
             ORDER BY created_at DESC
         """)
-        rows = cur.fetchall()
-        con.close()
+        rows = await cur.fetchall()
+        await cur.close()
         
         qa_pairs = []
         for row in rows:
@@ -989,14 +2182,12 @@ async def add_qa_pair(data: QAPairIn, request: Request):
     _require_admin(request)
     
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("""
-            INSERT INTO qa_pairs (question, answer, image_url)
-            VALUES (?, ?, ?)
-        """, (data.question, data.answer, data.image_url))
-        con.commit()
-        con.close()
+        await db_execute("""
+            INSERT INTO qa_pairs (question, answer, image_url, question_norm)
+            VALUES (?, ?, ?, ?)
+        """, (data.question, data.answer, data.image_url, normalize_query(data.question)))
+        answer_cache.clear()
+        qa_index.mark_stale()
         
         return {"status": "saved"}
     except Exception as e:
@@ -1008,43 +2199,67 @@ async def delete_qa_pair(qa_id: int, request: Request):
     _require_admin(request)
     
     try:
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        cur.execute("DELETE FROM qa_pairs WHERE id = ?", (qa_id,))
-        con.commit()
-        con.close()
+        await db_execute("DELETE FROM qa_pairs WHERE id = ?", (qa_id,))
+        answer_cache.clear()
+        qa_index.mark_stale()
         
         return {"status": "deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+ALLOWED_UPLOAD_EXTENSIONS = {'.md', '.txt', '.pdf', '.docx', '.html', '.csv'}
+
+async def save_upload(file: UploadFile) -> pathlib.Path:
+    """Validate and stream an uploaded file into data/uploads; raises HTTPException (400/413)"""
+    file_ext = pathlib.Path(file.filename).suffix.lower()
+    if file_ext not in ALLOWED_UPLOAD_EXTENSIONS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported file type: {file_ext}. Allowed: {', '.join(ALLOWED_UPLOAD_EXTENSIONS)}"
+        )
+    
+    upload_dir = BASE_DIR / "data" / "uploads"
+    upload_dir.mkdir(exist_ok=True, parents=True)
+    
+    file_path = upload_dir / file.filename
+    
+    # Stream to a temp file in fixed-size chunks; only replace the target once complete
+    part_path = file_path.with_name(file_path.name + ".part")
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large (max {UPLOAD_MAX_BYTES // (1024 * 1024)} MB)"
+                    )
+                await asyncio.to_thread(f.write, chunk)
+        os.replace(part_path, file_path)
+    finally:
+        if part_path.exists():
+            os.unlink(part_path)
+    return file_path
+
+def uploads_changed():
+    """Drop caches that depend on the index contents"""
+    reset_collection_cache()
+    memory_index.mark_stale()
+    answer_cache.clear()
+    invalidate_index_status()
+
 @app.post("/admin/upload-document")
 async def upload_document(request: Request, file: UploadFile = File(...)):
     """Upload and index a document"""
     _require_admin(request)
     
     try:
-        # Validate file type
-        allowed_extensions = {'.md', '.txt', '.pdf', '.docx', '.html', '.csv'}
-        file_ext = pathlib.Path(file.filename).suffix.lower()
-        if file_ext not in allowed_extensions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file type: {file_ext}. Allowed: {', '.join(allowed_extensions)}"
-            )
-        
-        # Save the file
-        upload_dir = BASE_DIR / "data" / "uploads"
-        upload_dir.mkdir(exist_ok=True, parents=True)
-        
-        file_path = upload_dir / file.filename
-        content = await file.read()
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
+        file_path = await save_upload(file)
         
         # Index the uploaded file
-        result = index_single_file(str(file_path), file.filename)
+        result = await asyncio.to_thread(index_single_file, str(file_path), file.filename)
+        uploads_changed()
         
         if result["status"] == "error":
             # Clean up the file if indexing failed
@@ -1074,39 +2289,124 @@ async def upload_document(request: Request, file: UploadFile = File(...)):
             pass
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/admin/upload-documents")
+async def upload_documents(request: Request, files: List[UploadFile] = File(...)):
+    """Upload and index several documents in one request; reports per-file results"""
+    _require_admin(request)
+    
+    results = []
+    indexed = 0
+    for file in files:
+        file_path = None
+        try:
+            file_path = await save_upload(file)
+            result = await asyncio.to_thread(index_single_file, str(file_path), file.filename)
+            if result["status"] == "error":
+                raise RuntimeError(f"Indexing failed: {result['message']}")
+            indexed += 1
+            results.append({
+                "filename": file.filename,
+                "status": "indexed",
+                "doc_id": result["doc_id"],
+                "title": result["title"],
+                "chunks": result["chunks"],
+                "tokens": result["tokens"]
+            })
+        except Exception as e:
+            if file_path is not None:
+                try:
+                    os.unlink(file_path)
+                except OSError:
+                    pass
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            results.append({"filename": file.filename, "status": "error", "error": detail})
+    
+    # One cache invalidation for the whole batch
+    if indexed:
+        uploads_changed()
+    
+    return {"status": "completed", "indexed": indexed, "failed": len(results) - indexed, "results": results}
+
+async def read_chunk_import(request: Request):
+    """Parse an import body: JSON (ChunkImportIn), or multipart with a JSON "meta" part and a float32 "embeddings" .npy part"""
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            data = ChunkImportIn.model_validate_json(await form["meta"].read())
+            embeddings = np.load(io.BytesIO(await form["embeddings"].read()), allow_pickle=False)
+        else:
+            data = ChunkImportIn.model_validate_json(await request.body())
+            embeddings = np.asarray(data.embeddings or [], dtype=np.float32)
+    except (KeyError, ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import body: {e}")
+    
+    if embeddings.ndim != 2 or embeddings.dtype.kind != "f":
+        raise HTTPException(status_code=400, detail="embeddings must be a 2-D float array")
+    if not (len(data.ids) == len(data.documents) == len(data.metadatas) == len(embeddings)):
+        raise HTTPException(status_code=400, detail="ids, documents, embeddings and metadatas must be the same length")
+    return data, embeddings
+
+# Idempotency-Key -> response of imports already applied, so client retries aren't upserted twice
+import_replays = TTLCache(maxsize=4096, ttl=3600)
+
+@app.post("/admin/import-chunks")
+async def import_chunks(request: Request):
+    """Upsert already-embedded chunks (e.g. copied from a local index) without re-embedding them"""
+    _require_admin(request)
+    idempotency_key = request.headers.get("idempotency-key")
+    if idempotency_key and idempotency_key in import_replays:
+        return import_replays[idempotency_key]
+    data, embeddings = await read_chunk_import(request)
+    
+    try:
+        indexer = load_indexing_module()
+        
+        def write_chunks():
+            collection = indexer.get_collection()
+            indexer.upsert_batched(collection, data.ids, data.documents, data.metadatas, embeddings)
+        
+        await asyncio.to_thread(write_chunks)
+        uploads_changed()
+        result = {"status": "imported", "count": len(data.ids)}
+        if idempotency_key:
+            import_replays[idempotency_key] = result
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/admin/sync-documents")
 async def sync_documents(request: Request):
     """Sync document tracking database with ChromaDB contents"""
     _require_admin(request)
     
     try:
-        collection = get_collection()
+        collection = _collection or await asyncio.to_thread(get_collection)
         if not collection:
             return {"status": "error", "message": "ChromaDB collection not found"}
         
         # Get all documents from ChromaDB
-        result = collection.get(include=["metadatas"])
+        result = await asyncio.to_thread(collection.get, include=["metadatas"])
         
         if not result["ids"]:
             return {"status": "success", "message": "No documents found in ChromaDB", "synced": 0}
         
         # Group chunks by document ID
         doc_groups = {}
+        untracked_chunks = 0
         for chunk_id, metadata in zip(result["ids"], result["metadatas"]):
             doc_id = metadata.get("doc_id")
-            if doc_id:
-                if doc_id not in doc_groups:
-                    doc_groups[doc_id] = {
-                        "chunks": [],
-                        "metadata": metadata
-                    }
-                doc_groups[doc_id]["chunks"].append(chunk_id)
-        
-        # Update document tracking database
-        con = sqlite3.connect(METRICS_DB)
-        cur = con.cursor()
-        
-        synced_count = 0
+            if not doc_id:
+                untracked_chunks += 1
+                continue
+            if doc_id not in doc_groups:
+                doc_groups[doc_id] = {
+                    "chunks": [],
+                    "metadata": metadata
+                }
+            doc_groups[doc_id]["chunks"].append(chunk_id)
+        
+        # Update document tracking database in one transaction
+        pending_rows = []
         for doc_id, doc_info in doc_groups.items():
             meta = doc_info["metadata"]
             chunk_count = len(doc_info["chunks"])
@@ -1115,11 +2415,7 @@ async def sync_documents(request: Request):
             estimated_chars = chunk_count * 800  # rough estimate
             estimated_tokens = chunk_count * 200  # rough estimate
             
-            cur.execute("""
-                INSERT OR REPLACE INTO documents 
-                (doc_id, title, path, source, tags, categories, url, video_url, last_updated, chars, tokens, chunk_count, last_indexed, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            pending_rows.append((
                 doc_id,
                 meta.get("title", "Unknown Document"),
                 meta.get("path", ""),
@@ -1135,18 +2431,70 @@ async def sync_documents(request: Request):
                 meta.get("last_indexed", ""),
                 "indexed"
             ))
-            synced_count += 1
         
-        con.commit()
-        con.close()
+        def write_rows() -> int:
+            con = _db()
+            try:
+                con.execute("BEGIN")
+                # Only the columns sync derives from Chroma; real chars/tokens and the
+                # indexer's change-detection state (content_sha1, mtime) are kept
+                con.executemany("""
+                    INSERT INTO documents 
+                    (doc_id, title, path, source, tags, categories, url, video_url, last_updated, chars, tokens, chunk_count, last_indexed, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(doc_id) DO UPDATE SET
+                      title=excluded.title, path=excluded.path, source=excluded.source,
+                      tags=excluded.tags, categories=excluded.categories, url=excluded.url,
+                      video_url=excluded.video_url, last_updated=excluded.last_updated,
+                      chunk_count=excluded.chunk_count, last_indexed=excluded.last_indexed,
+                      status=excluded.status
+                """, pending_rows)
+                # Drop rows for documents no longer in the index, unless some chunks
+                # predate doc_id metadata and can't be attributed to a row
+                stale = []
+                if not untracked_chunks:
+                    stale = [(doc_id,) for (doc_id,) in con.execute("SELECT doc_id FROM documents")
+                             if doc_id not in doc_groups]
+                    con.executemany("DELETE FROM documents WHERE doc_id = ?", stale)
+                con.execute("COMMIT")
+                return len(stale)
+            except Exception:
+                if con.in_transaction:
+                    con.execute("ROLLBACK")
+                raise
+        
+        pruned_count = await asyncio.to_thread(write_rows)
+        synced_count = len(pending_rows)
+        invalidate_index_status()
         
         return {
             "status": "success", 
-            "message": f"Synced {synced_count} documents from {len(result['ids'])} chunks",
+            "message": f"Synced {synced_count} documents from {len(result['ids'])} chunks, removed {pruned_count} stale",
             "synced": synced_count,
+            "pruned": pruned_count,
             "total_chunks": len(result["ids"])
         }
         
     except Exception as e:
         print(f"Error syncing documents: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/admin/bootstrap")
+async def bootstrap(request: Request):
+    """Current index status, a document sync and a background reindex in one round trip"""
+    _require_admin(request)
+    
+    initial_status = await index_status()
+    try:
+        sync = await sync_documents(request)
+    except HTTPException as e:
+        sync = {"status": "error", "message": e.detail}
+    
+    job_id = await start_reindex()
+    return {
+        "initial_status": initial_status,
+        "sync": sync,
+        "job_id": job_id,
+        "status": "started" if job_id is not None else "running",
+        "message": "Reindexing in background" if job_id is not None else "A reindex is already in progress"
+    }
@@ -6,36 +6,61 @@ extracts all blog post links, visits each one, extracts content + embedded video
 and saves Markdown versions for Obsidian and/or Airtable.
 
 Dependencies:
-    pip install playwright beautifulsoup4 markdownify requests
+    pip install playwright beautifulsoup4 lxml markdownify requests
     playwright install
 """
 
 import os
 import re
 import json
+import time
+import asyncio
+import threading
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 from markdownify import markdownify as md
 from urllib.parse import urljoin, urlparse
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 
 # --- Config ---
 BLOG_INDEX_URL = "https://creativepathworkshops.com/blog"
 BLOG_MATCH_PATTERN = "/blog/"
 
+# Pages fetched at once, each in its own browser context
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "8"))
+
 OUTPUT_DIR = Path("./academy_scrape")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # Optional: Obsidian vault path
 OBSIDIAN_VAULT_PATH = Path("/Users/robjr/Documents/RR Main Vault/Academy Blog")
-OBSIDIAN_VAULT_PATH.mkdir(parents=True, exist_ok=True)
 
 # Optional: Airtable settings
 USE_AIRTABLE = False  # Set to True and configure below to enable
 AIRTABLE_BASE_ID = "your_base_id"
 AIRTABLE_API_KEY = "your_api_key"
 AIRTABLE_TABLE_NAME = "Academy Blog Posts"
+AIRTABLE_MAX_RPS = 5  # Airtable's per-base rate limit
+
+# One keep-alive session for all Airtable calls. Creates are POSTs, so only retry when the record
+# can't have been written: a 429, or a connection that never opened. 5xx and dropped reads are not retried.
+AIRTABLE_SESSION = requests.Session()
+AIRTABLE_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=5, connect=5, read=0, other=0, backoff_factor=1.0, status_forcelist=[429],
+                      allowed_methods=None, raise_on_status=False),
+))
+_airtable_lock = threading.Lock()
+_airtable_next_slot = 0.0
+
+# Only the post-feed titles matter on the index page; skip building the rest of the tree.
+# Match on the class list: a plain class_ string misses titles that carry extra classes
+POST_FEED_TITLES = SoupStrainer(class_=lambda c: c is not None and "fl-post-feed-title" in c.split())
+# Archive/listing paths that aren't individual posts
+SKIP_PATH_RE = re.compile(r"/(tag|category|page|live-session)/")
 
 # --- Utilities ---
 def slugify(text):
@@ -49,88 +74,144 @@ def extract_video_links(soup):
             links.append(src)
     return links
 
+def wait_for_airtable_slot():
+    """Space calls at least 1/AIRTABLE_MAX_RPS apart across all scraper threads."""
+    global _airtable_next_slot
+    with _airtable_lock:
+        now = time.monotonic()
+        slot = max(now, _airtable_next_slot)
+        _airtable_next_slot = slot + 1.0 / AIRTABLE_MAX_RPS
+    if slot > now:
+        time.sleep(slot - now)
+
 def push_to_airtable(record):
     headers = {
         "Authorization": f"Bearer {AIRTABLE_API_KEY}",
-        "Content-Type": "application/json"
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip"
     }
     url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_TABLE_NAME}"
     data = {"fields": record}
-    response = requests.post(url, headers=headers, json=data)
+    wait_for_airtable_slot()
+    response = AIRTABLE_SESSION.post(url, headers=headers, json=data, timeout=30)
     return response.status_code, response.text
 
-def extract_blog_post_urls(start_url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
-        page.goto(start_url)
-        html = page.content()
-        soup = BeautifulSoup(html, "html.parser")
-
-        base = start_url.split("/")[0] + "//" + start_url.split("/")[2]
-        urls = set()
-        main_section = soup.find("main") or soup.body
-        for a in main_section.select(".fl-post-feed-title a[href]"):
-            href = a["href"]
-            href = a["href"]
-            full_url = urljoin(base, href)
-        full_url = urljoin(base, href)
-        path = urlparse(full_url).path
-        # Include root-level posts only (e.g. /post-slug/)
-        if all(x not in path for x in ["/tag/", "/category/", "/page/", "/live-session/"]):
-                urls.add(full_url)
-
-        browser.close()
-        return sorted(urls)
+# Only the HTML is parsed (iframe src included), so skip every other asset
+BLOCKED_RESOURCE_TYPES = {"image", "font", "stylesheet", "media", "other"}
+
+async def block_assets(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def new_text_context(browser):
+    context = await browser.new_context()
+    await context.route("**/*", block_assets)
+    return context
+
+async def extract_blog_post_urls(browser, start_url):
+    context = await new_text_context(browser)
+    try:
+        page = await context.new_page()
+        await page.goto(start_url, wait_until="domcontentloaded")
+        html = await page.content()
+    finally:
+        await context.close()
+    return post_urls_from_index(html, start_url)
+
+def post_urls_from_index(html, start_url):
+    soup = BeautifulSoup(html, "lxml", parse_only=POST_FEED_TITLES)
+
+    base = start_url.split("/")[0] + "//" + start_url.split("/")[2]
+    hrefs = [a["href"] for a in soup.select(".fl-post-feed-title a[href]")]
+    # Include root-level posts only (e.g. /post-slug/); the set drops repeated links
+    urls = {
+        full_url for full_url in (urljoin(base, href) for href in hrefs)
+        if not SKIP_PATH_RE.search(urlparse(full_url).path)
+    }
+
+    return sorted(urls)
+
+def save_post(url, html):
+    soup = BeautifulSoup(html, "lxml")
+
+    title = soup.title.string.strip() if soup.title else urlparse(url).path.strip("/").replace("/", " ")
+    slug = slugify(title)
+    main = soup.find("main") or soup.body
+    video_links = extract_video_links(soup)
+    markdown = md(str(main))
+
+    # Prepare output
+    header = f"# {title}\n\n"
+    videos_md = "\n".join(f"- Video: {link}" for link in video_links)
+    full_md = f"{header}{videos_md}\n\n---\n\n{markdown}"
+
+    # Write to local .md file (encoded once, single write)
+    output_path = OUTPUT_DIR / f"{slug}.md"
+    data = full_md.encode("utf-8")
+    with open(output_path, "wb", buffering=1 << 20) as f:
+        f.write(data)
+
+    # Optionally mirror to Obsidian: hardlink, or write the same bytes across filesystems
+    if OBSIDIAN_VAULT_PATH:
+        obsidian_path = OBSIDIAN_VAULT_PATH / f"{slug}.md"
+        try:
+            os.link(output_path, obsidian_path)
+        except OSError:
+            with open(obsidian_path, "wb") as f:
+                f.write(data)
+
+    # Optionally push to Airtable
+    if USE_AIRTABLE:
+        record = {
+            "Title": title,
+            "URL": url,
+            "Video Links": ", ".join(video_links),
+            "Markdown": markdown[:5000]  # Airtable text limits
+        }
+        status, msg = push_to_airtable(record)
+        print(f"Airtable response: {status} - {msg}")
+
+async def scrape_one(contexts, url):
+    # Borrow a context from the pool; at most SCRAPE_CONCURRENCY pages are in flight
+    context = await contexts.get()
+    try:
+        print(f"Scraping: {url}")
+        page = await context.new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded")
+            html = await page.content()
+        finally:
+            await page.close()
+    except Exception as e:
+        print(f"Failed to scrape {url}: {e}")
+        return
+    finally:
+        contexts.put_nowait(context)
+    # Parsing, markdown conversion and writes are blocking; keep them off the event loop
+    await asyncio.to_thread(save_post, url, html)
 
 # --- Main ---
-# Step 1: Extract all individual blog post links from the archive page
-blog_urls = extract_blog_post_urls(BLOG_INDEX_URL)
-print(f"Found {len(blog_urls)} blog posts.")
+async def main():
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    OBSIDIAN_VAULT_PATH.mkdir(parents=True, exist_ok=True)
+    async with async_playwright() as p:
+        # One browser for the whole run; contexts are cheap, browsers are not
+        browser = await p.chromium.launch(headless=True)
 
-with sync_playwright() as p:
-    browser = p.chromium.launch(headless=True)
-    page = browser.new_page()
+        # Step 1: Extract all individual blog post links from the archive page
+        blog_urls = await extract_blog_post_urls(browser, BLOG_INDEX_URL)
+        print(f"Found {len(blog_urls)} blog posts.")
 
-    for url in blog_urls:
-        print(f"Scraping: {url}")
-        page.goto(url)
-        html = page.content()
-        soup = BeautifulSoup(html, "html.parser")
-
-        title = soup.title.string.strip() if soup.title else urlparse(url).path.strip("/").replace("/", " ")
-        slug = slugify(title)
-        main = soup.find("main") or soup.body
-        video_links = extract_video_links(soup)
-        markdown = md(str(main))
-
-        # Prepare output
-        header = f"# {title}\n\n"
-        videos_md = "\n".join(f"- Video: {link}" for link in video_links)
-        full_md = f"{header}{videos_md}\n\n---\n\n{markdown}"
-
-        # Write to local .md file
-        output_path = OUTPUT_DIR / f"{slug}.md"
-        with open(output_path, "w") as f:
-            f.write(full_md)
-
-        # Optionally write to Obsidian
-        if OBSIDIAN_VAULT_PATH:
-            obsidian_path = OBSIDIAN_VAULT_PATH / f"{slug}.md"
-            with open(obsidian_path, "w") as f:
-                f.write(full_md)
-
-        # Optionally push to Airtable
-        if USE_AIRTABLE:
-            record = {
-                "Title": title,
-                "URL": url,
-                "Video Links": ", ".join(video_links),
-                "Markdown": markdown[:5000]  # Airtable text limits
-            }
-            status, msg = push_to_airtable(record)
-            print(f"Airtable response: {status} - {msg}")
-
-    browser.close()
-
-print("✅ Finished crawling blog index and exporting.")
+        contexts = asyncio.Queue()
+        for _ in range(SCRAPE_CONCURRENCY):
+            contexts.put_nowait(await new_text_context(browser))
+        await asyncio.gather(*(scrape_one(contexts, url) for url in blog_urls))
+
+        await browser.close()
+
+    print("✅ Finished crawling blog index and exporting.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
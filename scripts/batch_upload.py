@@ -5,67 +5,85 @@ Batch upload documents to Railway via the upload API
 
 import os
 import glob
+import gzip
 import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configuration
 RAILWAY_API_URL = "https://academy-ai-production.up.railway.app"
 ADMIN_TOKEN = "supersecret123"
 RAW_DIR = "data/raw"
-BATCH_SIZE = 5  # Upload 5 files at a time to avoid timeouts
-DELAY_BETWEEN_BATCHES = 2  # seconds
+UPLOAD_WORKERS = 8  # uploads in flight at once
+# Request bodies at least this big are gzipped (the API inflates Content-Encoding: gzip)
+GZIP_MIN_BYTES = 4 * 1024
+
+# One pooled keep-alive session shared by all upload threads
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    # Re-uploading a file is idempotent (the server upserts by doc id), so POSTs are retried too
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=None, raise_on_status=False),
+))
+
+def post_upload(name: str, f) -> requests.Response:
+    """POST one file body to the upload endpoint, gzipped when worth it"""
+    request = session.prepare_request(requests.Request(
+        "POST",
+        f"{RAILWAY_API_URL}/admin/upload-document",
+        headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
+        files={'file': (name, f, 'text/plain')},
+    ))
+    if len(request.body) >= GZIP_MIN_BYTES:
+        # requests only decompresses responses, so the multipart body is compressed by hand
+        request.body = gzip.compress(request.body, compresslevel=6)
+        request.headers["Content-Encoding"] = "gzip"
+        request.headers["Content-Length"] = str(len(request.body))
+    return session.send(request, timeout=60)  # 60 second timeout
 
 def upload_file(file_path: str) -> bool:
     """Upload a single file to Railway"""
     try:
-        headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+        name = os.path.basename(file_path)
         
         with open(file_path, 'rb') as f:
-            files = {'file': (os.path.basename(file_path), f, 'text/plain')}
-            
-            print(f"📤 Uploading: {os.path.basename(file_path)}...", end=" ")
-            response = requests.post(
-                f"{RAILWAY_API_URL}/admin/upload-document",
-                headers=headers,
-                files=files,
-                timeout=60  # 60 second timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✅ Success! ({result.get('chunks', 0)} chunks)")
-                return True
-            else:
-                print(f"❌ Failed: {response.status_code}")
-                if response.text:
-                    print(f"   Error: {response.text[:100]}...")
-                return False
+            response = post_upload(name, f)
+        
+        if response.status_code == 200:
+            result = response.json()
+            print(f"📤 {name}: ✅ Success! ({result.get('chunks', 0)} chunks)")
+            return True
+        else:
+            print(f"📤 {name}: ❌ Failed: {response.status_code}")
+            if response.text:
+                print(f"   Error: {response.text[:100]}...")
+            return False
                 
     except Exception as e:
-        print(f"❌ Error: {str(e)[:100]}...")
+        print(f"📤 {os.path.basename(file_path)}: ❌ Error: {str(e)[:100]}...")
         return False
 
 def get_sample_files(limit: int = 20) -> list:
     """Get a sample of markdown files to upload"""
     pattern = os.path.join(RAW_DIR, "**", "*.md")
-    all_files = glob.glob(pattern, recursive=True)
+    all_files = sorted(f.replace(os.sep, "/") for f in glob.glob(pattern, recursive=True))
     
-    # Prioritize certain types of content
-    priority_patterns = [
-        "**/blog/robertrodriguezjr.com/**",
-        "**/ls transcripts/**", 
-        "**/creativepathworkshops/**"
-    ]
+    # Prioritize certain types of content (matched as directory components, in this order)
+    priority_dirs = (
+        "/blog/robertrodriguezjr.com/",
+        "/ls transcripts/",
+        "/creativepathworkshops/",
+    )
     
-    priority_files = []
-    for pattern in priority_patterns:
-        matches = glob.glob(os.path.join(RAW_DIR, pattern), recursive=True)
-        priority_files.extend([f for f in matches if f.endswith('.md')])
-    
-    # Remove duplicates and take sample
-    unique_files = list(set(priority_files))
-    return unique_files[:limit]
+    # Single traversal above; dict.fromkeys dedups while keeping priority order
+    priority_files = dict.fromkeys(
+        f for d in priority_dirs for f in all_files if d in f
+    )
+    return list(priority_files)[:limit]
 
 def main():
     """Main upload function"""
@@ -81,27 +99,11 @@ def main():
     
     print(f"📋 Found {len(files_to_upload)} files to upload")
     
-    # Upload in batches
-    total_uploaded = 0
-    total_failed = 0
-    
-    for i in range(0, len(files_to_upload), BATCH_SIZE):
-        batch = files_to_upload[i:i+BATCH_SIZE]
-        batch_num = (i // BATCH_SIZE) + 1
-        
-        print(f"\n📦 Batch {batch_num}/{(len(files_to_upload) + BATCH_SIZE - 1) // BATCH_SIZE}")
-        print("-" * 50)
-        
-        for file_path in batch:
-            if upload_file(file_path):
-                total_uploaded += 1
-            else:
-                total_failed += 1
-        
-        # Delay between batches
-        if i + BATCH_SIZE < len(files_to_upload):
-            print(f"⏱️ Waiting {DELAY_BETWEEN_BATCHES}s before next batch...")
-            time.sleep(DELAY_BETWEEN_BATCHES)
+    # Upload concurrently over the shared session
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        results = list(pool.map(upload_file, files_to_upload))
+    total_uploaded = sum(results)
+    total_failed = len(results) - total_uploaded
     
     print(f"\n" + "=" * 60)
     print(f"📊 UPLOAD SUMMARY")
@@ -113,7 +115,7 @@ def main():
     # Check final status
     print(f"\n🔍 Checking final status...")
     try:
-        response = requests.get(f"{RAILWAY_API_URL}/index-status")
+        response = session.get(f"{RAILWAY_API_URL}/index-status", timeout=(3.05, 30))
         if response.status_code == 200:
             status = response.json()
             print(f"📊 Vector count: {status.get('vector_count', 0)}")
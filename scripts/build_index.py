@@ -9,9 +9,11 @@
 # - Logs per-document stats to SQLite: data/telemetry.db
 # - Supports: .md .txt .html .pdf .docx .csv
 
-import os, re, time, json, glob, hashlib, csv, sys, sqlite3
+import os, re, time, json, hashlib, csv, sys, sqlite3, asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime, UTC
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Callable, Iterable, Iterator
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -19,22 +21,36 @@ load_dotenv()
 
 # ---------------- Config (env-overridable) ----------------
 RAW_ROOT       = os.getenv("RAW_ROOT", "data/raw")
+# A relative RAW_ROOT is opened against ROOT_DIR but stored (path, doc_id) as-is,
+# so the CLI and the API (which points ROOT_DIR at the repo) write the same ids
+ROOT_DIR       = "."
 CHROMA_DIR     = os.getenv("CHROMA_DIR", "data/chroma")
 COLLECTION     = os.getenv("CHROMA_COLLECTION", "academy_kb")
 EMBED_MODEL    = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 CHUNK_TOKENS   = int(os.getenv("CHUNK_TOKENS", "1000"))
 CHUNK_OVERLAP  = int(os.getenv("CHUNK_OVERLAP", "100"))
-BATCH_SIZE     = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+BATCH_SIZE     = int(os.getenv("EMBED_BATCH_SIZE", "256"))  # inputs per request (API allows 2048)
 EMBED_RETRIES  = int(os.getenv("EMBED_RETRIES", "5"))
 EMBED_BACKOFF  = float(os.getenv("EMBED_BACKOFF", "1.0"))  # seconds base
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "8"))  # embedding requests in flight
+PARSE_WORKERS  = int(os.getenv("PARSE_WORKERS", "4"))  # files read + chunked ahead of the embedder
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))  # API caps a request at 300k tokens
+CHROMA_BATCH   = int(os.getenv("CHROMA_BATCH", "200"))  # records per Chroma upsert
+PENDING_LIMIT  = int(os.getenv("PENDING_LIMIT", "512"))  # chunks buffered across docs before flushing to Chroma
 
 # metrics DB
 METRICS_DB     = os.getenv("METRICS_DB", "data/telemetry.db")
 
 # ---------------- Third-party libs ----------------
+import numpy as np
+import yaml
 import chromadb
 from chromadb.config import Settings
 from pypdf import PdfReader
+try:
+    import pypdfium2 as pdfium  # PDFium text extraction; much faster than pypdf when installed
+except ImportError:
+    pdfium = None
 from docx import Document as DocxDocument
 try:
     from markdownify import markdownify as html_to_md
@@ -42,10 +58,11 @@ except Exception:
     html_to_md = None
 
 import tiktoken
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 # ---------------- Utilities ----------------
 FRONT_MATTER_RE = re.compile(r"^---\s*\n(.*?)\n---\s*\n?", re.DOTALL)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # LibYAML when PyYAML was built with it
 
 def now_iso() -> str:
     return datetime.now(UTC).isoformat(timespec="seconds")
@@ -68,20 +85,46 @@ def ensure_metrics_db():
       chars INTEGER,
       tokens INTEGER,
       chunk_count INTEGER,
-      last_indexed TEXT
+      last_indexed TEXT,
+      content_sha1 TEXT,
+      mtime REAL
     )
     """)
+    # older databases predate the change-detection columns
+    for col in ("content_sha1 TEXT", "mtime REAL"):
+        try:
+            cur.execute(f"ALTER TABLE documents ADD COLUMN {col}")
+        except sqlite3.OperationalError:
+            pass
     con.commit()
     con.close()
 
-def upsert_document_row(row: Dict):
+def load_indexed_docs() -> Dict[str, Tuple[str, int]]:
+    """doc_id -> (content_sha1, chunk_count) as of the last run."""
     con = sqlite3.connect(METRICS_DB)
-    cur = con.cursor()
-    cur.execute("""
+    try:
+        return {doc_id: (sha1, chunk_count or 0) for doc_id, sha1, chunk_count in
+                con.execute("SELECT doc_id, content_sha1, chunk_count FROM documents")}
+    finally:
+        con.close()
+
+def removed_docs(files: List[str]) -> List[Tuple[str, int]]:
+    """(doc_id, chunk_count) of rows under RAW_ROOT whose file is no longer in `files`"""
+    prefix = os.path.join(RAW_ROOT, "")
+    current = {file_id(p) for p in files}
+    con = sqlite3.connect(METRICS_DB)
+    try:
+        return [(doc_id, chunk_count or 0) for doc_id, path, chunk_count in
+                con.execute("SELECT doc_id, path, chunk_count FROM documents")
+                if path and path.startswith(prefix) and doc_id not in current]
+    finally:
+        con.close()
+
+UPSERT_DOCUMENT_SQL = """
     INSERT INTO documents
-      (doc_id, title, path, source, tags, categories, url, video_url, last_updated, chars, tokens, chunk_count, last_indexed)
+      (doc_id, title, path, source, tags, categories, url, video_url, last_updated, chars, tokens, chunk_count, last_indexed, content_sha1, mtime)
     VALUES
-      (:doc_id, :title, :path, :source, :tags, :categories, :url, :video_url, :last_updated, :chars, :tokens, :chunk_count, :last_indexed)
+      (:doc_id, :title, :path, :source, :tags, :categories, :url, :video_url, :last_updated, :chars, :tokens, :chunk_count, :last_indexed, :content_sha1, :mtime)
     ON CONFLICT(doc_id) DO UPDATE SET
       title=excluded.title,
       path=excluded.path,
@@ -94,17 +137,54 @@ def upsert_document_row(row: Dict):
       chars=excluded.chars,
       tokens=excluded.tokens,
       chunk_count=excluded.chunk_count,
-      last_indexed=excluded.last_indexed
-    """, row)
-    con.commit()
-    con.close()
+      last_indexed=excluded.last_indexed,
+      content_sha1=excluded.content_sha1,
+      mtime=excluded.mtime
+    """
+
+def connect_metrics_db() -> sqlite3.Connection:
+    """Autocommit connection in WAL mode; callers group writes with BEGIN/COMMIT."""
+    con = sqlite3.connect(METRICS_DB, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+def upsert_document_rows(con: sqlite3.Connection, rows: List[Dict]):
+    """Write many document rows in one transaction."""
+    if not rows:
+        return
+    con.execute("BEGIN")
+    try:
+        con.executemany(UPSERT_DOCUMENT_SQL, rows)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+def upsert_document_row(row: Dict):
+    con = connect_metrics_db()
+    try:
+        upsert_document_rows(con, [row])
+    finally:
+        con.close()
 
 def parse_front_matter(text: str) -> Tuple[Dict, str]:
-    """Return (meta, body) with permissive YAML (key: value, [a, b])."""
+    """Return (meta, body); YAML front matter, falling back to a line parser for hand-written blocks YAML rejects."""
     m = FRONT_MATTER_RE.match(text)
+    if not m:
+        return {}, text
+    try:
+        meta = yaml.load(m.group(1), Loader=YAML_LOADER)
+        if isinstance(meta, dict):
+            return meta, text[m.end():]
+    except yaml.YAMLError:
+        pass
+    return parse_front_matter_lines(m.group(1)), text[m.end():]
+
+def parse_front_matter_lines(raw: str) -> Dict:
+    """Permissive key: value / [a, b] parser (e.g. unquoted titles containing ': ')."""
     meta: Dict = {}
-    if m:
-        raw = m.group(1)
+    if raw:
         for line in raw.splitlines():
             s = line.strip()
             if not s or s.startswith("#") or ":" not in s:
@@ -119,8 +199,7 @@ def parse_front_matter(text: str) -> Tuple[Dict, str]:
                 meta[key] = [x.strip().strip("'").strip('"') for x in inner.split(",")] if inner else []
             else:
                 meta[key] = val
-        return meta, text[m.end():]
-    return {}, text
+    return meta
 
 def normalize_scalar(v):
     """Chroma requires scalar metadata; we also store scalars in SQLite."""
@@ -140,19 +219,45 @@ def read_txt(path: str) -> str:
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
-def read_pdf(path: str) -> str:
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    if pdfium is not None:
+        try:
+            pdf = pdfium.PdfDocument(path)
+        except Exception:
+            pdf = None  # files PDFium can't open still get a chance with pypdf
+        if pdf is not None:
+            try:
+                for page in pdf:
+                    try:
+                        textpage = page.get_textpage()
+                        try:
+                            yield textpage.get_text_range()
+                        finally:
+                            textpage.close()
+                    except Exception:
+                        pass
+                    finally:
+                        page.close()
+            finally:
+                pdf.close()
+            return
     reader = PdfReader(path)
-    out = []
     for p in reader.pages:
         try:
-            out.append(p.extract_text() or "")
+            yield p.extract_text() or ""
         except Exception:
             pass
-    return "\n".join(out).strip()
 
-def read_docx(path: str) -> str:
+def read_pdf(path: str) -> str:
+    return "\n".join(iter_pdf_pages(path)).strip()
+
+def iter_docx_paragraphs(path: str) -> Iterator[str]:
     doc = DocxDocument(path)
-    return "\n".join(p.text for p in doc.paragraphs)
+    for p in doc.paragraphs:
+        yield p.text
+
+def read_docx(path: str) -> str:
+    return "\n".join(iter_docx_paragraphs(path))
 
 def read_html(path: str) -> str:
     raw = read_txt(path)
@@ -164,10 +269,9 @@ def read_html(path: str) -> str:
     return re.sub(r"<[^>]+>", "", raw)
 
 def read_csv_text(path: str) -> str:
-    rows = []
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        r = csv.DictReader(f)
-        rows.extend(r)
+    # newline="" lets the csv module handle quoted multi-line cells; 1 MiB reads for large exports
+    with open(path, "r", encoding="utf-8", errors="ignore", newline="", buffering=1 << 20) as f:
+        rows = list(csv.DictReader(f))
     return json.dumps(rows, ensure_ascii=False, indent=2)
 
 READERS = {
@@ -180,6 +284,12 @@ READERS = {
     ".csv":  read_csv_text,
 }
 
+# Formats the indexer chunks piece by piece instead of materializing the whole text
+STREAM_READERS = {
+    ".pdf":  iter_pdf_pages,
+    ".docx": iter_docx_paragraphs,
+}
+
 def file_id(path: str) -> str:
     return hashlib.sha1(path.encode("utf-8")).hexdigest()
 
@@ -188,10 +298,24 @@ def title_from_meta_or_path(meta: Dict, path: str) -> str:
         return str(meta["title"]).strip()
     return os.path.splitext(os.path.basename(path))[0].replace("-", " ").strip()
 
+IGNORE_DIR_NAMES = {"__pycache__", "node_modules"}
+
+def resolve_path(path: str) -> str:
+    """Where a stored path lives on disk"""
+    return os.path.join(ROOT_DIR, path)
+
 def gather_files(root: str) -> List[str]:
+    """One walk over the tree; hidden entries (.git, .obsidian, ...) are skipped, as glob did.
+    Paths come back in stored form: `root` joined with the path below it."""
     paths: List[str] = []
-    for ext in READERS.keys():
-        paths += glob.glob(os.path.join(root, "**", f"*{ext}"), recursive=True)
+    top = resolve_path(root)
+    for dirpath, dirs, files in os.walk(top):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in IGNORE_DIR_NAMES]
+        rel = os.path.relpath(dirpath, top)
+        base = root if rel == "." else os.path.join(root, rel)
+        for fn in files:
+            if not fn.startswith(".") and os.path.splitext(fn)[1].lower() in READERS:
+                paths.append(os.path.join(base, fn))
     return sorted(paths)
 
 def read_file_text(path: str) -> Tuple[Dict, str]:
@@ -206,40 +330,78 @@ def read_file_text(path: str) -> Tuple[Dict, str]:
     return {}, text
 
 # ---------------- Chunking ----------------
-def get_encoder():
-    return tiktoken.get_encoding("cl100k_base")
-
 ENC = None
-def tokenize(text: str) -> List[int]:
+
+def get_encoder():
+    """cl100k_base, loaded on first use: tiktoken may have to download it, so importing this module doesn't"""
     global ENC
     if ENC is None:
-        ENC = get_encoder()
-    return ENC.encode(text)
+        ENC = tiktoken.get_encoding("cl100k_base")
+    return ENC
+
+def tokenize(text: str) -> List[int]:
+    # encode_ordinary skips the special-token scan (and never raises on "<|endoftext|>" in a doc)
+    return get_encoder().encode_ordinary(text)
 
 def detokenize(tokens: List[int]) -> str:
-    return ENC.decode(tokens)
+    return get_encoder().decode(tokens)
 
-def chunk_text(text: str, chunk_tokens: int, overlap_tokens: int) -> List[str]:
-    toks = tokenize(text)
+def chunk_windows(toks: List[int], chunk_tokens: int, overlap_tokens: int) -> List[List[int]]:
     n = len(toks)
-    if n == 0:
-        return []
-    chunks: List[str] = []
+    windows: List[List[int]] = []
     start = 0
     while start < n:
         end = min(start + chunk_tokens, n)
-        chunks.append(detokenize(toks[start:end]))
+        windows.append(toks[start:end])
         if end == n:
             break
         start = max(0, end - overlap_tokens)
-    return chunks
+    return windows
+
+def chunk_text_stream(pieces: Iterable[str], chunk_tokens: int, overlap_tokens: int) -> Iterator[List[int]]:
+    """chunk_windows() over text arriving in pieces; only about one window of tokens is held at a time."""
+    buf: List[int] = []
+    for piece in pieces:
+        buf.extend(tokenize(piece))
+        while len(buf) > chunk_tokens:
+            yield buf[:chunk_tokens]
+            buf = buf[chunk_tokens - overlap_tokens:]
+    if buf:
+        yield buf
+
+def chunk_text(text: str, chunk_tokens: int, overlap_tokens: int, toks: List[int] = None) -> List[str]:
+    """Split into overlapping token windows. Pass `toks` if the text is already encoded."""
+    if toks is None:
+        toks = tokenize(text)
+    return [detokenize(w) for w in chunk_windows(toks, chunk_tokens, overlap_tokens)]
 
 def make_chunk_id(doc_id: str, idx: int) -> str:
     return f"{doc_id}_{idx:05d}"
 
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+def make_hashed_chunk_ids(doc_id: str, hashes: List[str]) -> List[str]:
+    """Content-addressed chunk ids; repeated text within a doc gets a numeric suffix."""
+    seen: Dict[str, int] = {}
+    ids: List[str] = []
+    for h in hashes:
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        ids.append(f"{doc_id}:{h}" if n == 0 else f"{doc_id}:{h}:{n}")
+    return ids
+
 # ---------------- OpenAI embeddings (retry) ----------------
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+def async_client() -> AsyncOpenAI:
+    """Fresh async client; its connections belong to the event loop it is first used on."""
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def is_transient(e: Exception) -> bool:
+    msg = str(e).lower()
+    return ("429" in msg) or ("rate limit" in msg) or ("temporar" in msg)
+
 def embed_batch(texts: List[str]) -> List[List[float]]:
     delay = EMBED_BACKOFF
     for attempt in range(1, EMBED_RETRIES + 1):
@@ -247,36 +409,204 @@ def embed_batch(texts: List[str]) -> List[List[float]]:
             resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
             return [d.embedding for d in resp.data]
         except Exception as e:
-            msg = str(e).lower()
-            transient = ("429" in msg) or ("rate limit" in msg) or ("temporar" in msg)
-            if transient and attempt < EMBED_RETRIES:
+            if is_transient(e) and attempt < EMBED_RETRIES:
                 time.sleep(delay)
                 delay *= 2
                 continue
             raise
 
-def embed_all(texts: List[str], batch_size: int = BATCH_SIZE) -> List[List[float]]:
+async def aembed_batch(aclient: AsyncOpenAI, texts: List[str]) -> List[List[float]]:
+    delay = EMBED_BACKOFF
+    for attempt in range(1, EMBED_RETRIES + 1):
+        try:
+            resp = await aclient.embeddings.create(model=EMBED_MODEL, input=texts)
+            return [d.embedding for d in resp.data]
+        except Exception as e:
+            if is_transient(e) and attempt < EMBED_RETRIES:
+                await asyncio.sleep(delay)
+                delay *= 2
+                continue
+            raise
+
+def normalize_vectors(vecs: List[List[float]]) -> List[List[float]]:
+    """L2-normalize so inner product == cosine similarity."""
+    arr = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (arr / norms).tolist()
+
+def pack_batches(texts: List[str], batch_size: int, token_counts: List[int] = None,
+                 max_tokens: int = EMBED_BATCH_TOKENS) -> List[List[str]]:
+    """Group texts into requests bounded by both item count and total tokens."""
+    if token_counts is None:
+        token_counts = [len(t) for t in get_encoder().encode_ordinary_batch(texts)]
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    used = 0
+    for text, n in zip(texts, token_counts):
+        if batch and (len(batch) >= batch_size or used + n > max_tokens):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(text)
+        used += n
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def aembed_all(texts: List[str], batch_size: int = BATCH_SIZE, token_counts: List[int] = None,
+                     concurrency: int = EMBED_CONCURRENCY, aclient: AsyncOpenAI = None) -> List[List[float]]:
+    """Embed all batches with up to `concurrency` requests in flight; output order matches `texts`.
+    A client passed in is left open for the caller; otherwise one is made and closed here."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+    own_client = aclient is None
+    if own_client:
+        aclient = async_client()
+
+    async def one(batch: List[str]) -> List[List[float]]:
+        async with sem:
+            return await aembed_batch(aclient, batch)
+
+    try:
+        results = await asyncio.gather(*(one(b) for b in pack_batches(texts, batch_size, token_counts)))
+    finally:
+        if own_client:
+            await aclient.close()
     out: List[List[float]] = []
-    for i in range(0, len(texts), batch_size):
-        vecs = embed_batch(texts[i:i + batch_size])
-        out.extend(vecs)
-        time.sleep(0.05)
+    for vecs in results:
+        out.extend(normalize_vectors(vecs))
     return out
 
+class Embedder:
+    """One event loop and AsyncOpenAI client shared by every embed_all() call of an indexing run,
+    so connections (and their TLS sessions) outlive a single flush."""
+
+    def __init__(self):
+        self.runner = asyncio.Runner()
+        self.aclient = None
+
+    def embed(self, texts: List[str], batch_size: int, token_counts: List[int] = None) -> List[List[float]]:
+        if self.aclient is None:
+            self.aclient = async_client()
+        return self.runner.run(aembed_all(texts, batch_size, token_counts, aclient=self.aclient))
+
+    def close(self):
+        try:
+            if self.aclient is not None:
+                self.runner.run(self.aclient.close())
+        finally:
+            self.runner.close()
+
+def embed_all(texts: List[str], batch_size: int = BATCH_SIZE, token_counts: List[int] = None,
+              embedder: Optional[Embedder] = None) -> List[List[float]]:
+    """Synchronous entry point; must not be called from a thread with a running event loop."""
+    if not texts:
+        return []
+    if embedder is not None:
+        return embedder.embed(texts, batch_size, token_counts)
+    return asyncio.run(aembed_all(texts, batch_size, token_counts))
+
+def chunk_embed_key(text: str) -> str:
+    return hashlib.sha256(f"{EMBED_MODEL}\0{text}".encode("utf-8")).hexdigest()
+
+def embed_all_cached(texts: List[str], batch_size: int = BATCH_SIZE, token_counts: List[int] = None,
+                     embedder: Optional[Embedder] = None) -> List[List[float]]:
+    """embed_all(), reusing vectors for any chunk text embedded before (by this or an earlier run)."""
+    keys = [chunk_embed_key(t) for t in texts]
+    con = sqlite3.connect(METRICS_DB)
+    try:
+        con.execute("CREATE TABLE IF NOT EXISTS chunk_embed_cache (key TEXT PRIMARY KEY, vec BLOB)")
+        found: Dict[str, bytes] = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            found.update(con.execute(
+                f"SELECT key, vec FROM chunk_embed_cache WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+
+        out: List[List[float]] = [None] * len(texts)
+        misses = []
+        for i, k in enumerate(keys):
+            if k in found:
+                out[i] = np.frombuffer(found[k], dtype=np.float32).tolist()
+            else:
+                misses.append(i)
+
+        if misses:
+            vecs = embed_all([texts[i] for i in misses], batch_size,
+                             [token_counts[i] for i in misses] if token_counts else None, embedder)
+            for i, v in zip(misses, vecs):
+                out[i] = v
+            con.executemany("INSERT OR IGNORE INTO chunk_embed_cache (key, vec) VALUES (?, ?)",
+                            [(keys[i], np.asarray(v, dtype=np.float32).tobytes()) for i, v in zip(misses, vecs)])
+            con.commit()
+        return out
+    finally:
+        con.close()
+
+def prune_chunk_embed_cache(coll) -> int:
+    """Drop cached vectors whose chunk text is no longer stored in the collection; returns rows removed."""
+    keep = set()
+    offset = 0
+    while True:
+        page = coll.get(include=["documents"], limit=1000, offset=offset)
+        if not page["ids"]:
+            break
+        keep.update(chunk_embed_key(d) for d in page["documents"] if d is not None)
+        offset += len(page["ids"])
+    con = sqlite3.connect(METRICS_DB)
+    try:
+        con.execute("CREATE TABLE IF NOT EXISTS chunk_embed_cache (key TEXT PRIMARY KEY, vec BLOB)")
+        con.execute("CREATE TEMP TABLE keep_keys (key TEXT PRIMARY KEY)")
+        con.executemany("INSERT OR IGNORE INTO keep_keys (key) VALUES (?)", [(k,) for k in keep])
+        removed = con.execute(
+            "DELETE FROM chunk_embed_cache WHERE key NOT IN (SELECT key FROM keep_keys)"
+        ).rowcount
+        con.commit()
+        return removed
+    finally:
+        con.close()
+
 # ---------------- Chroma helpers ----------------
+chroma_client = None  # created on first use; the API injects its own client
+
+def get_chroma_client():
+    global chroma_client
+    if chroma_client is None:
+        chroma_client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(allow_reset=True))
+    return chroma_client
+
 def get_collection():
-    client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(allow_reset=True))
+    client = get_chroma_client()
     try:
-        return client.get_collection(COLLECTION)
+        # embeddings are always supplied; no default embedding function to fall back on
+        return client.get_collection(COLLECTION, embedding_function=None)
     except Exception:
-        return client.create_collection(COLLECTION)
+        # vectors are unit-length, so inner product ranks the same as cosine without the norms
+        return client.create_collection(COLLECTION, metadata={"hnsw:space": "ip"}, embedding_function=None)
 
 def clear_collection():
-    coll = get_collection()
+    """Drop the collection; the next get_collection() recreates it empty (and with the "ip" space)"""
     try:
-        coll.delete(where={})
-    except Exception:
-        pass
+        get_chroma_client().delete_collection(COLLECTION)
+    except ValueError:
+        pass  # nothing to drop yet
+
+def upsert_batched(coll, ids: List[str], documents: List[str], metadatas: List[Dict],
+                   embeddings: List[List[float]] = None, batch: int = CHROMA_BATCH):
+    """Upsert in windows of `batch` records; Chroma is slow with very large single calls."""
+    for i in range(0, len(ids), batch):
+        kwargs = {}
+        if embeddings is not None:
+            kwargs["embeddings"] = embeddings[i:i + batch]
+        coll.upsert(ids=ids[i:i + batch], documents=documents[i:i + batch],
+                    metadatas=metadatas[i:i + batch], **kwargs)
+
+def render_meta_block(meta: Dict) -> str:
+    """Citation header prepended to each chunk in the LLM context (stored so queries don't rebuild it)."""
+    lines = [f"Title: {meta.get('title') or 'Unknown'}"]
+    for label, key in (("URL", "url"), ("Video", "video_url"), ("Source", "source")):
+        if meta.get(key):
+            lines.append(f"{label}: {meta[key]}")
+    return "\n".join(lines) + "\n—\n"
 
 def guess_source_from_path(path: str) -> str:
     p = path.replace("\\", "/").lower()
@@ -286,76 +616,217 @@ def guess_source_from_path(path: str) -> str:
     return "doc"
 
 # ---------------- Indexing ----------------
-def index():
+def content_hasher(meta: Dict):
+    head = json.dumps(meta, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(f"{head}\0".encode("utf-8"))
+
+def content_sha1(meta: Dict, body: str) -> str:
+    """Hash of front matter + body, so metadata-only edits are re-indexed too."""
+    h = content_hasher(meta)
+    h.update(body.encode("utf-8"))
+    return h.hexdigest()
+
+def prepare_streamed(pieces: Iterable[str]):
+    """Hash, count and chunk text arriving in pieces (joined by newlines) without building the full body."""
+    h = content_hasher({})
+    stats = {"chars": 0, "blank": True}
+
+    def tracked():
+        for i, piece in enumerate(pieces):
+            if i:
+                piece = "\n" + piece
+            h.update(piece.encode("utf-8"))
+            stats["chars"] += len(piece)
+            if stats["blank"] and piece.strip():
+                stats["blank"] = False
+            yield piece
+
+    windows = list(chunk_text_stream(tracked(), CHUNK_TOKENS, CHUNK_OVERLAP))
+    if stats["blank"] or not windows:
+        return None
+    # consecutive windows share exactly CHUNK_OVERLAP tokens
+    tokens = sum(len(w) for w in windows) - CHUNK_OVERLAP * (len(windows) - 1)
+    return {}, h.hexdigest(), stats["chars"], tokens, windows, [detokenize(w) for w in windows]
+
+def prepare_file(path: str, known_sha1: Optional[str] = None):
+    """Read, hash and chunk one file; runs on the prefetch pool. Returns None for empty files,
+    else (meta, sha1, chars, tokens, windows, chunks). PDF/DOCX text is chunked as it is read;
+    other files skip chunking (tokens/windows/chunks are None) when the hash equals `known_sha1`."""
+    stream = STREAM_READERS.get(os.path.splitext(path)[1].lower())
+    if stream:
+        return prepare_streamed(stream(path))
+    meta, body = read_file_text(path)
+    if not body.strip():
+        return None
+    sha1 = content_sha1(meta, body)
+    if sha1 == known_sha1:
+        return meta, sha1, len(body), None, None, None
+    toks = tokenize(body)
+    windows = chunk_windows(toks, CHUNK_TOKENS, CHUNK_OVERLAP)
+    if not windows:
+        return None
+    return meta, sha1, len(body), len(toks), windows, [detokenize(w) for w in windows]
+
+def prefetch(files: List[str], known: Dict[str, Tuple[str, int]], workers: int = PARSE_WORKERS,
+             processes: bool = False):
+    """Yield (path, prepare_file(path)) in order while up to `workers` later files are parsed in the background.
+    With `processes`, parsing runs in worker processes instead of threads (CLI runs only: the module
+    must be importable by the workers, which it isn't when the API loads it from a file path)."""
+    workers = max(1, workers)
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=workers) as pool:
+        pending = deque()
+        it = iter(files)
+        for path in it:
+            pending.append((path, pool.submit(prepare_file, resolve_path(path), known.get(file_id(path), (None,))[0])))
+            if len(pending) >= workers:
+                break
+        while pending:
+            path, fut = pending.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(prepare_file, resolve_path(nxt), known.get(file_id(nxt), (None,))[0])))
+            yield path, fut.result()
+
+def is_indexed(coll, doc_id: str) -> bool:
+    """First chunk present and written with doc_id (chunks indexed before it was stored get rewritten)"""
+    got = coll.get(ids=[make_chunk_id(doc_id, 0)], include=["metadatas"])
+    return bool(got["ids"]) and (got["metadatas"][0] or {}).get("doc_id") == doc_id
+
+def index(progress: Optional[Callable[[int, int, int], None]] = None, processes: bool = False):
+    """Index every file under RAW_ROOT; progress(files_done, files_total, chunks) is called per file"""
     ensure_metrics_db()
 
     print("Indexing from:", RAW_ROOT)
     files = gather_files(RAW_ROOT)
     print(f"Found {len(files)} files to index.")
     coll = get_collection()
+    known = load_indexed_docs()
 
     total_chunks = 0
-    for path in files:
-        meta, body = read_file_text(path)
-        if not body.strip():
-            continue
-
-        title = title_from_meta_or_path(meta, path)
-        doc_id = file_id(path)
-
-        base_meta = {
-            "title":        normalize_scalar(title),
-            "path":         normalize_scalar(path),
-            "source":       normalize_scalar(meta.get("source", guess_source_from_path(path))),
-            "last_indexed": normalize_scalar(now_iso()),
-        }
-        for k in ("tags", "categories", "url", "video_url", "last_updated", "role"):
-            if k in meta:
-                base_meta[k] = normalize_scalar(meta[k])
-
-        # chunk & simple stats
-        chunks = chunk_text(body, CHUNK_TOKENS, CHUNK_OVERLAP)
-        if not chunks:
-            continue
-        chars  = len(body)
-        tokens = len(tokenize(body))
-        chunk_count = len(chunks)
-
-        # embed and upsert to Chroma
-        _ = embed_all(chunks, batch_size=BATCH_SIZE)
-        ids = [make_chunk_id(doc_id, i) for i in range(len(chunks))]
-        metadatas = [{**base_meta, "chunk_index": i} for i in range(len(chunks))]
-        coll.upsert(ids=ids, documents=chunks, metadatas=[normalize_metadata(m) for m in metadatas])
-
-        # upsert to metrics DB
-        upsert_document_row({
-            "doc_id":       doc_id,
-            "title":        base_meta["title"],
-            "path":         base_meta["path"],
-            "source":       base_meta["source"],
-            "tags":         normalize_scalar(meta.get("tags")),
-            "categories":   normalize_scalar(meta.get("categories")),
-            "url":          normalize_scalar(meta.get("url")),
-            "video_url":    normalize_scalar(meta.get("video_url")),
-            "last_updated": normalize_scalar(meta.get("last_updated")),
-            "chars":        chars,
-            "tokens":       tokens,
-            "chunk_count":  chunk_count,
-            "last_indexed": base_meta["last_indexed"],
-        })
-
-        total_chunks += len(chunks)
-        print(f"Indexed: {title}  ({len(chunks)} chunks)")
-
-    print(f"\nDone. Total chunks: {total_chunks}")
+    unchanged = 0
+
+    # chunks from several docs are embedded and upserted together; doc rows are written once their vectors are in
+    pending_ids: List[str] = []
+    pending_docs: List[str] = []
+    pending_metas: List[Dict] = []
+    pending_tokens: List[int] = []
+    pending_rows: List[Dict] = []
+
+    con = connect_metrics_db()
+    embedder = Embedder()
+
+    def flush():
+        if pending_ids:
+            vectors = embed_all_cached(pending_docs, batch_size=BATCH_SIZE, token_counts=pending_tokens,
+                                       embedder=embedder)
+            upsert_batched(coll, pending_ids, pending_docs, pending_metas, vectors)
+        upsert_document_rows(con, pending_rows)
+        for buf in (pending_ids, pending_docs, pending_metas, pending_tokens, pending_rows):
+            buf.clear()
+
+    if progress:
+        progress(0, len(files), 0)
+    try:
+        workers = (os.cpu_count() or 1) if processes else PARSE_WORKERS
+        for n, (path, prepared) in enumerate(prefetch(files, known, workers, processes), 1):
+            if progress and n > 1:
+                progress(n - 1, len(files), total_chunks)
+            if prepared is None:
+                continue
+            meta, sha1, chars, tokens, windows, chunks = prepared
+
+            title = title_from_meta_or_path(meta, path)
+            doc_id = file_id(path)
+            prev_sha1, prev_chunk_count = known.get(doc_id, (None, 0))
+
+            # unchanged since the last run and still in Chroma: nothing to embed
+            if sha1 == prev_sha1 and is_indexed(coll, doc_id):
+                unchanged += 1
+                continue
+            if windows is None:
+                meta, sha1, chars, tokens, windows, chunks = prepare_file(resolve_path(path))
+
+            base_meta = {
+                "doc_id":       doc_id,  # sources are deduplicated on it; titles can collide
+                "title":        normalize_scalar(title),
+                "path":         normalize_scalar(path),
+                "source":       normalize_scalar(meta.get("source", guess_source_from_path(path))),
+                "last_indexed": normalize_scalar(now_iso()),
+            }
+            for k in ("tags", "categories", "url", "video_url", "last_updated", "role"):
+                if k in meta:
+                    base_meta[k] = normalize_scalar(meta[k])
+            base_meta["meta_block"] = render_meta_block(base_meta)
+
+            chunk_count = len(chunks)
+
+            # embedded and upserted to Chroma on the next flush
+            pending_ids.extend(make_chunk_id(doc_id, i) for i in range(len(chunks)))
+            pending_docs.extend(chunks)
+            pending_metas.extend(normalize_metadata({**base_meta, "chunk_index": i}) for i in range(len(chunks)))
+            pending_tokens.extend(len(w) for w in windows)
+            if prev_chunk_count > chunk_count:
+                # the doc shrank; drop its trailing chunks from the previous run
+                coll.delete(ids=[make_chunk_id(doc_id, i) for i in range(chunk_count, prev_chunk_count)])
+
+            # metrics DB row, written on the next flush
+            pending_rows.append({
+                "doc_id":       doc_id,
+                "title":        base_meta["title"],
+                "path":         base_meta["path"],
+                "source":       base_meta["source"],
+                "tags":         normalize_scalar(meta.get("tags")),
+                "categories":   normalize_scalar(meta.get("categories")),
+                "url":          normalize_scalar(meta.get("url")),
+                "video_url":    normalize_scalar(meta.get("video_url")),
+                "last_updated": normalize_scalar(meta.get("last_updated")),
+                "chars":        chars,
+                "tokens":       tokens,
+                "chunk_count":  chunk_count,
+                "last_indexed": base_meta["last_indexed"],
+                "content_sha1": sha1,
+                "mtime":        os.path.getmtime(resolve_path(path)),
+            })
+
+            total_chunks += len(chunks)
+            print(f"Indexed: {title}  ({len(chunks)} chunks)")
+            if len(pending_ids) >= PENDING_LIMIT:
+                flush()
+
+        flush()
+
+        # files deleted since the last run; an empty tree is more likely a wrong RAW_ROOT than a wipe
+        removed = removed_docs(files) if files else []
+        for doc_id, chunk_count in removed:
+            if chunk_count:
+                coll.delete(ids=[make_chunk_id(doc_id, i) for i in range(chunk_count)])
+        if removed:
+            con.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id, _ in removed])
+    finally:
+        embedder.close()
+        con.close()
+    if total_chunks or removed:
+        # replaced and deleted chunks leave vectors behind that no later run would hit
+        print("Pruned cached embeddings:", prune_chunk_embed_cache(coll))
+    if progress:
+        progress(len(files), len(files), total_chunks)
+    print(f"\nDone. Total chunks: {total_chunks}  (unchanged files skipped: {unchanged}, removed: {len(removed)})")
     try:
         print("Chroma count:", get_collection().count())
     except Exception:
         pass
 
 # ---------------- Main ----------------
-if __name__ == "__main__":
-    if "--no-clear" not in sys.argv:
+def main(argv: List[str] = None, progress: Optional[Callable[[int, int, int], None]] = None,
+         processes: bool = False):
+    argv = sys.argv[1:] if argv is None else argv
+    # incremental by default: unchanged files are skipped; --rebuild drops the collection and rewrites every file
+    if "--rebuild" in argv:
         print("Clearing existing vectors …")
         clear_collection()
-    index()
\ No newline at end of file
+    index(progress, processes)
+
+if __name__ == "__main__":
+    # standalone runs parse on every core; the API keeps its default thread pool
+    main(processes=True)
\ No newline at end of file
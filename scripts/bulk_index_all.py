@@ -3,91 +3,327 @@
 Efficiently index all documents from data/raw to Railway production
 """
 
+import argparse
+import gzip
+import hashlib
 import os
-import glob
+import random
 import requests
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from operator import itemgetter
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 
 # Configuration
 RAILWAY_API_URL = "https://academy-ai-production.up.railway.app"
 ADMIN_TOKEN = "supersecret123"
 RAW_DIR = "data/raw"
-BATCH_SIZE = 10  # Files per batch
-DELAY_BETWEEN_BATCHES = 3  # seconds
+MANIFEST_PATH = "data/.bulk_index_manifest.json"  # path -> sha1/uploaded_at/chunks of indexed files
+BATCH_SIZE = 10  # Files per request to /admin/upload-documents
+BATCH_MAX_BYTES = 200 * 1024  # Close a batch early once its files reach ~200KB
 MAX_FILE_SIZE = 1024 * 1024  # 1MB limit
+UPLOAD_WORKERS = 8  # Batch requests in flight at once
+GZIP_MIN_BYTES = 4 * 1024  # Gzip request bodies at least this big (the API inflates them)
+STATUS_POLL_INTERVAL = 5.0  # Seconds between server status checks that steer the pacer
+
+# Shared keep-alive session: one TLS handshake per pooled connection, not per file
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+def scan_markdown_files(root):
+    """Yield (path, size) for every .md under root; sizes come from the scandir entries"""
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue  # .git, .obsidian, ... (glob skipped these too)
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_markdown_files(entry.path)
+            elif entry.name.endswith(".md"):
+                try:
+                    yield entry.path, entry.stat().st_size
+                except OSError:
+                    continue
 
 def get_all_markdown_files():
     """Get all markdown files from data/raw"""
-    pattern = os.path.join(RAW_DIR, "**", "*.md")
-    all_files = glob.glob(pattern, recursive=True)
-    
     # Filter out very large files and sort by size (smaller first)
     valid_files = []
-    for file_path in all_files:
-        try:
-            size = os.path.getsize(file_path)
-            if size < MAX_FILE_SIZE:
-                valid_files.append((file_path, size))
-            else:
-                print(f"⚠️  Skipping large file: {os.path.basename(file_path)} ({size/1024:.1f}KB)")
-        except:
-            continue
+    for file_path, size in scan_markdown_files(RAW_DIR):
+        if size < MAX_FILE_SIZE:
+            valid_files.append((file_path, size))
+        else:
+            print(f"⚠️  Skipping large file: {os.path.basename(file_path)} ({size/1024:.1f}KB)")
     
     # Sort by size (smaller files first for faster initial progress)
-    valid_files.sort(key=lambda x: x[1])
+    valid_files.sort(key=itemgetter(1))
     return [f[0] for f in valid_files]
 
-def upload_file(file_path: str) -> dict:
-    """Upload a single file and return result"""
+UPLOAD_ATTEMPTS = 3  # Tries per batch for timeouts, connection errors, 408 and 5xx
+
+@dataclass
+class CircuitBreaker:
+    """Fail fast after repeated server failures instead of waiting out every timeout.
+
+    closed -> open after `fail_threshold` consecutive failures; open -> half_open once
+    `reset_after` seconds pass, letting a single probe through; its outcome closes or reopens.
+    """
+    fail_threshold: int = 5
+    reset_after: float = 60.0
+    state: str = "closed"
+    failure_count: int = 0
+    opened_at: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at > self.reset_after:
+                self.state = "half_open"
+                return True  # the probe
+            return self.state == "closed"
+    
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failure_count = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failure_count += 1
+            if self.state == "half_open" or self.failure_count >= self.fail_threshold:
+                self.state = "open"
+                self.opened_at = time.time()
+
+breaker = CircuitBreaker()
+
+@dataclass
+class AdaptivePacer:
+    """Pace uploads across threads from server feedback (AIMD).
+
+    Two knobs: `limit` batches in flight (1..UPLOAD_WORKERS) and a `delay` between request
+    starts (min_delay..max_delay). Clean responses shrink the gap by 25% and a climbing
+    /index-status vector count widens the window by one; 429s, 5xx, timeouts and a running
+    server-side reindex halve the window, and throttles at least double the gap (1s-30s).
+    """
+    limit: int = UPLOAD_WORKERS
+    delay: float = 0.5
+    min_delay: float = 0.05
+    max_delay: float = 30.0
+    in_flight: int = 0
+    next_slot: float = 0.0
+    _cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
+    
+    def acquire(self):
+        """Wait for a free slot in the window, then for this request's start time"""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+    
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+    
+    def record_success(self):
+        with self._cond:
+            self.delay = max(self.min_delay, self.delay * 0.75)
+    
+    def record_throttle(self):
+        with self._cond:
+            self.delay = min(self.max_delay, max(1.0, self.delay * 2 + random.random()))
+            self.limit = max(1, self.limit // 2)
+    
+    def record_progress(self):
+        with self._cond:
+            self.limit = min(UPLOAD_WORKERS, self.limit + 1)
+            self._cond.notify()
+    
+    def record_busy(self):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+
+pacer = AdaptivePacer()
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code in (408, 429) or 500 <= status_code < 600
+
+def post_with_retry(session: requests.Session, url: str, **kwargs):
+    """POST with jittered backoff on transient failures; returns None when the circuit is open.
+
+    An open circuit returns before pacer.acquire(), so skipped batches never sleep.
+    """
+    for attempt in range(UPLOAD_ATTEMPTS):
+        if not breaker.allow():
+            return None
+        pacer.acquire()
+        try:
+            response = session.post(url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError):
+            breaker.record_failure()
+            pacer.record_throttle()
+            if attempt == UPLOAD_ATTEMPTS - 1:
+                raise
+        else:
+            if not is_retryable_status(response.status_code):
+                breaker.record_success()
+                pacer.record_success()
+                return response
+            pacer.record_throttle()
+            # 429 means "slow down", not "server down": back off without tripping the breaker
+            if response.status_code != 429:
+                breaker.record_failure()
+            if attempt == UPLOAD_ATTEMPTS - 1:
+                return response
+        finally:
+            pacer.release()  # the backoff sleep below doesn't hold a window slot
+        time.sleep(min(2 ** attempt, 30) + random.random() * 0.5)
+
+def make_batches(file_paths: list) -> list:
+    """Group files into batches of at most BATCH_SIZE files and ~BATCH_MAX_BYTES"""
+    batches, batch, batch_bytes = [], [], 0
+    for file_path in file_paths:
+        size = os.path.getsize(file_path)
+        if batch and (len(batch) >= BATCH_SIZE or batch_bytes + size > BATCH_MAX_BYTES):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(file_path)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+def upload_batch(session: requests.Session, file_paths: list) -> list:
+    """Upload several files in one multipart request and return one result per file"""
     try:
-        headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
-        filename = os.path.basename(file_path)
+        url = f"{RAILWAY_API_URL}/admin/upload-documents"
+        files = []
+        for file_path in file_paths:
+            with open(file_path, 'rb') as f:
+                files.append(('files', (os.path.basename(file_path), f.read(), 'text/plain')))
+        
+        # Encode the multipart body once; retries resend the same (possibly gzipped) bytes
+        request = session.prepare_request(requests.Request(
+            "POST", url, headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}, files=files
+        ))
+        body, headers = request.body, dict(request.headers)
+        if len(body) >= GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(body))
+        
+        response = post_with_retry(
+            session,
+            url,
+            headers=headers,
+            data=body,
+            timeout=120  # 2 minute timeout
+        )
         
-        with open(file_path, 'rb') as f:
-            files = {'file': (filename, f, 'text/plain')}
-            
-            response = requests.post(
-                f"{RAILWAY_API_URL}/admin/upload-document",
-                headers=headers,
-                files=files,
-                timeout=120  # 2 minute timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
+        if response is None:
+            return [
+                {"status": "circuit_open", "filename": os.path.basename(p), "path": p,
+                 "error": "circuit open: server failing, skipped without sending"}
+                for p in file_paths
+            ]
+        if response.status_code == 200:
+            return [
+                {
                     "status": "success",
-                    "filename": filename,
-                    "chunks": result.get("chunks", 0),
-                    "title": result.get("title", filename)
-                }
-            else:
-                return {
+                    "filename": r["filename"],
+                    "path": p,
+                    "chunks": r.get("chunks", 0),
+                    "title": r.get("title", r["filename"])
+                } if r["status"] == "indexed" else {
                     "status": "error",
-                    "filename": filename,
-                    "error": f"HTTP {response.status_code}: {response.text[:100]}"
+                    "filename": r["filename"],
+                    "path": p,
+                    "error": str(r.get("error", ""))[:100]
                 }
-                
+                # The API answers with one result per file, in upload order
+                for p, r in zip(file_paths, response.json()["results"])
+            ]
+        error = f"HTTP {response.status_code}: {response.text[:100]}"
     except Exception as e:
-        return {
-            "status": "error", 
-            "filename": os.path.basename(file_path),
-            "error": str(e)[:100]
-        }
+        error = str(e)[:100]
+    
+    return [
+        {"status": "error", "filename": os.path.basename(p), "path": p, "error": error}
+        for p in file_paths
+    ]
+
+def file_sha1(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest: dict):
+    """Write the manifest via a temp file so an interrupted run never leaves it half-written"""
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
 
 def get_current_status():
     """Get current indexing status"""
     try:
-        response = requests.get(f"{RAILWAY_API_URL}/index-status")
+        response = session.get(f"{RAILWAY_API_URL}/index-status", timeout=(3.05, 30))
         if response.status_code == 200:
             return response.json()
     except:
         pass
     return {"vector_count": 0, "status": "unknown"}
 
-def main():
+def get_reindex_status():
+    """Progress of the server's latest reindex run ({} if unavailable)"""
+    try:
+        response = session.get(f"{RAILWAY_API_URL}/admin/reindex-status",
+                               headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}, timeout=(3.05, 30))
+        if response.status_code == 200:
+            return response.json()
+    except requests.RequestException:
+        pass
+    return {}
+
+def watch_server(stop: threading.Event, interval: float = STATUS_POLL_INTERVAL):
+    """Steer the pacer from server state while uploads run.
+
+    A climbing vector count widens the upload window; a reindex running on the server
+    (it competes for the same embedding quota and Chroma writes) narrows it. An unchanged
+    count is no signal either way: re-uploaded files replace their chunks in place.
+    """
+    last_count = None
+    while not stop.wait(interval):
+        if get_reindex_status().get("status") == "running":
+            pacer.record_busy()
+            continue
+        status = get_current_status()
+        if status.get("status") == "unknown":
+            continue
+        count = status.get("vector_count", 0)
+        if last_count is not None and count > last_count:
+            pacer.record_progress()
+        last_count = count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload every markdown file in data/raw to Railway")
+    parser.add_argument("--force", action="store_true", help="Re-upload files the manifest says are unchanged")
+    args = parser.parse_args(argv)
+    
     print("🚀 BULK INDEXING ALL DOCUMENTS TO RAILWAY")
     print("=" * 60)
     
@@ -96,62 +332,90 @@ def main():
     print(f"📊 Starting vector count: {initial_status.get('vector_count', 0)}")
     
     # Get all files
-    files_to_upload = get_all_markdown_files()
+    candidates = get_all_markdown_files()
+    
+    # Skip files whose content matches what the last successful upload sent
+    manifest = load_manifest()
+    digests = {}
+    files_to_upload = []
+    for file_path in candidates:
+        try:
+            digests[file_path] = file_sha1(file_path)
+        except OSError:
+            continue
+        if args.force or manifest.get(file_path, {}).get("sha1") != digests[file_path]:
+            files_to_upload.append(file_path)
+    total_skipped = len(candidates) - len(files_to_upload)
     total_files = len(files_to_upload)
     
-    print(f"📋 Found {total_files} markdown files to index")
-    print(f"⚙️  Batch size: {BATCH_SIZE} files")
-    print(f"⏱️  Delay between batches: {DELAY_BETWEEN_BATCHES}s")
-    print(f"🎯 Estimated time: {(total_files/BATCH_SIZE * DELAY_BETWEEN_BATCHES)/60:.1f} minutes")
+    print(f"📋 Found {len(candidates)} markdown files, {total_files} new or changed")
+    if total_skipped:
+        print(f"⏭️  Skipping {total_skipped} unchanged files (use --force to re-upload)")
+    if not files_to_upload:
+        print("✅ Nothing to upload")
+        return
+    batches = make_batches(files_to_upload)
+    total_batches = len(batches)
+    print(f"⚙️  Batch size: up to {BATCH_SIZE} files / {BATCH_MAX_BYTES // 1024}KB per request")
+    print(f"📦 {total_batches} batch requests, {UPLOAD_WORKERS} in flight")
     
     # Process in batches
     total_uploaded = 0
     total_failed = 0
     total_chunks = 0
+    files_done = 0
     
-    for i in range(0, total_files, BATCH_SIZE):
-        batch = files_to_upload[i:i+BATCH_SIZE]
-        batch_num = (i // BATCH_SIZE) + 1
-        total_batches = (total_files + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        print(f"\n📦 Batch {batch_num}/{total_batches} ({len(batch)} files)")
-        print("-" * 50)
-        
-        batch_success = 0
-        batch_chunks = 0
-        
-        for file_path in batch:
-            result = upload_file(file_path)
-            
-            if result["status"] == "success":
-                chunks = result["chunks"]
-                print(f"✅ {result['filename']} ({chunks} chunks)")
-                total_uploaded += 1
-                batch_success += 1
-                batch_chunks += chunks
-                total_chunks += chunks
-            else:
-                print(f"❌ {result['filename']}: {result['error']}")
-                total_failed += 1
-        
-        # Batch summary
-        print(f"   📈 Batch: {batch_success}/{len(batch)} success, {batch_chunks} chunks")
-        print(f"   📊 Total: {total_uploaded}/{total_uploaded+total_failed} files, {total_chunks} chunks")
-        
-        # Progress update
-        progress = ((i + len(batch)) / total_files) * 100
-        print(f"   🎯 Progress: {progress:.1f}% complete")
-        
-        # Check current vector count
-        if batch_num % 5 == 0:  # Every 5 batches
-            current_status = get_current_status()
-            current_vectors = current_status.get("vector_count", 0)
-            print(f"   📊 Current vectors in database: {current_vectors}")
-        
-        # Delay between batches (except for the last one)
-        if i + BATCH_SIZE < total_files:
-            print(f"   ⏱️  Waiting {DELAY_BETWEEN_BATCHES}s before next batch...")
-            time.sleep(DELAY_BETWEEN_BATCHES)
+    # Uploaded files are recorded as batches finish; the manifest is saved even if the run is cut short
+    stop_watch = threading.Event()
+    threading.Thread(target=watch_server, args=(stop_watch,), daemon=True).start()
+    try:
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+            futures = {pool.submit(upload_batch, session, batch): batch for batch in batches}
+            for batch_num, future in enumerate(as_completed(futures), 1):
+                batch = futures[future]
+                
+                print(f"\n📦 Batch {batch_num}/{total_batches} ({len(batch)} files)")
+                print("-" * 50)
+                
+                batch_success = 0
+                batch_chunks = 0
+                
+                for result in future.result():
+                    if result["status"] == "success":
+                        chunks = result["chunks"]
+                        print(f"✅ {result['filename']} ({chunks} chunks)")
+                        total_uploaded += 1
+                        batch_success += 1
+                        batch_chunks += chunks
+                        total_chunks += chunks
+                        manifest[result["path"]] = {
+                            "sha1": digests[result["path"]],
+                            "uploaded_at": time.time(),
+                            "chunks": chunks,
+                        }
+                    else:
+                        print(f"❌ {result['filename']}: {result['error']}")
+                        total_failed += 1
+                
+                # Batch summary
+                print(f"   📈 Batch: {batch_success}/{len(batch)} success, {batch_chunks} chunks")
+                print(f"   📊 Total: {total_uploaded}/{total_uploaded+total_failed} files, {total_chunks} chunks")
+                print(f"   ⏱️  Request spacing: {pacer.delay:.2f}s, up to {pacer.limit} in flight")
+                
+                # Progress update
+                files_done += len(batch)
+                progress = (files_done / total_files) * 100
+                print(f"   🎯 Progress: {progress:.1f}% complete")
+                
+                # Check current vector count
+                if batch_num % 5 == 0:  # Every 5 batches
+                    current_status = get_current_status()
+                    current_vectors = current_status.get("vector_count", 0)
+                    print(f"   📊 Current vectors in database: {current_vectors}")
+                    save_manifest(manifest)
+    finally:
+        stop_watch.set()
+        save_manifest(manifest)
     
     # Final summary
     print(f"\n" + "=" * 60)
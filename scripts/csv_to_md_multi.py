@@ -33,66 +33,122 @@ from __future__ import annotations
 import argparse
 import csv
 import datetime as dt
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# ---------- optional fast CSV reader ----------
+try:
+    import pyarrow as pa  # pip install pyarrow
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+# Exports at least this big are parsed with pyarrow when it's installed
+ARROW_MIN_BYTES = 16 * 1024 * 1024
 
 # ---------- optional HTML → Markdown ----------
 try:
-    from markdownify import markdownify as mdify  # pip install markdownify
+    from markdownify import MarkdownConverter  # pip install markdownify
+    # Built once: options are validated here, and the converter caches its per-tag handlers
+    MD_CONVERTER = MarkdownConverter(heading_style="ATX", bullets="*")
 except Exception:
-    mdify = None
+    MD_CONVERTER = None
     print(
         "[warn] 'markdownify' not found. Install for best results:\n"
         "  python -m pip install markdownify\n",
         file=sys.stderr,
     )
 
-WP_COMMENT_PATTERN = re.compile(r"<!--\s*\/?wp:[^>]*-->\s*", re.IGNORECASE)
-TAG_STRIP_PATTERN = re.compile(r"</?(div|span)[^>]*>", re.IGNORECASE)
+# One pass for Gutenberg comments, div/span wrappers (dropped) and <br> (newline)
+CLEAN_PATTERN = re.compile(
+    r"(<!--\s*/?wp:[^>]*-->\s*)|(</?(?:div|span)[^>]*>)|(<br\s*/?>)", re.IGNORECASE
+)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
 
-def html_to_md(s: str) -> str:
-    """Convert Gutenberg/HTML to clean Markdown; fallback to plain text."""
+def _clean_repl(m: re.Match) -> str:
+    return "\n" if m.group(3) else ""
+
+def _html_to_md_with_markdownify(s: str) -> str:
+    """Convert Gutenberg/HTML to clean Markdown."""
     if not s:
         return ""
-    s = WP_COMMENT_PATTERN.sub("", s)
-    s = TAG_STRIP_PATTERN.sub("", s)
-    s = re.sub(r"<br\s*/?>", "\n", s, flags=re.IGNORECASE)
-    if mdify:
-        s = mdify(s, heading_style="ATX", bullets="*")
-    else:
-        s = re.sub(r"<[^>]+>", "", s)
-    s = re.sub(r"\n{3,}", "\n\n", s).strip()
-    return s
+    s = MD_CONVERTER.convert(CLEAN_PATTERN.sub(_clean_repl, s))
+    return BLANK_LINES_PATTERN.sub("\n\n", s).strip()
+
+def _html_to_md_plain(s: str) -> str:
+    """Fallback without markdownify: strip tags to plain text."""
+    if not s:
+        return ""
+    s = TAG_PATTERN.sub("", CLEAN_PATTERN.sub(_clean_repl, s))
+    return BLANK_LINES_PATTERN.sub("\n\n", s).strip()
+
+html_to_md = _html_to_md_with_markdownify if MD_CONVERTER else _html_to_md_plain
 
 URL_RE = re.compile(r"https?://[^\s)>\"]+", re.IGNORECASE)
 VIDEO_HOSTS = ("youtube.com","youtu.be","vimeo.com","player.vimeo.com","wistia.com","fast.wistia.net","prestoplayer","presto-player")
+VIDEO_HOST_RE = re.compile("|".join(map(re.escape, VIDEO_HOSTS)), re.IGNORECASE)
 
 def extract_urls(text: str) -> list[str]:
     return URL_RE.findall(text or "")
 
 def pick_video_url(urls: list[str]) -> Optional[str]:
     for u in urls or []:
-        lu = u.lower()
-        if any(h in lu for h in VIDEO_HOSTS):
+        if VIDEO_HOST_RE.search(u):
             return u
     return (urls or [None])[0]
 
+def find_video_url(text: str) -> Optional[str]:
+    """pick_video_url(extract_urls(text)) in one scan, without building the URL list."""
+    first = None
+    for m in URL_RE.finditer(text or ""):
+        u = m.group(0)
+        if VIDEO_HOST_RE.search(u):
+            return u
+        if first is None:
+            first = u
+    return first
+
 # ---------- utils ----------
+SLUG_DROP = str.maketrans({"&": " and ", "’": "", "'": ""})
+SLUG_RE = re.compile(r"[^a-z0-9]+")  # one run of anything else -> a single dash
+
 def slugify(text: str) -> str:
-    t = (text or "").strip().lower()
-    t = t.replace("&", " and ").replace("’", "").replace("'", "")
-    t = re.sub(r"[^a-z0-9]+", "-", t)
-    t = re.sub(r"-{2,}", "-", t).strip("-")
-    return t or "untitled"
+    t = (text or "").strip().lower().translate(SLUG_DROP)
+    return SLUG_RE.sub("-", t).strip("-") or "untitled"
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%b %d %Y", "%B %d %Y")
+DATE_HEAD_RE = re.compile(r"(\d+)([-/])\d")
+# Leading "digits + separator" shape -> the only DATE_FORMATS that can match it, in the same order
+DATE_FORMATS_BY_HEAD = {
+    (4, "-"): ("%Y-%m-%d",),
+    (4, "/"): ("%Y/%m/%d",),
+    (1, "/"): ("%m/%d/%Y", "%d/%m/%Y"),
+    (2, "/"): ("%m/%d/%Y", "%d/%m/%Y"),
+    (1, "-"): (),
+    (2, "-"): (),
+}
 
+@lru_cache(maxsize=4096)
 def parse_date(s: str) -> Optional[str]:
     s = (s or "").strip()
     if not s:
         return None
-    fmts = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%b %d %Y", "%B %d %Y"]
-    for f in fmts:
+    # Exports are mostly plain YYYY-MM-DD; date.fromisoformat is far cheaper than strptime
+    if len(s) == 10 and s[4] == "-" and s[7] == "-":
+        try:
+            return dt.date.fromisoformat(s).isoformat()
+        except ValueError:
+            pass
+    head = DATE_HEAD_RE.match(s)
+    formats = DATE_FORMATS_BY_HEAD.get((len(head.group(1)), head.group(2)), DATE_FORMATS) if head else DATE_FORMATS
+    for f in formats:
         try:
             return dt.datetime.strptime(s, f).date().isoformat()
         except ValueError:
@@ -103,20 +159,15 @@ def parse_date(s: str) -> Optional[str]:
         return f"{int(y):04d}-{int(mo):02d}-{int(d):02d}"
     return None
 
+LIST_SPLIT_RE = re.compile(r"[;,|]")
+WHITESPACE_RE = re.compile(r"\s+")
+
 def split_list_field(s: str) -> List[str]:
     if not s:
         return []
-    parts = re.split(r"[;,|]", s)
-    out, seen = [], set()
-    for p in parts:
-        t = p.strip()
-        if not t:
-            continue
-        # normalize to kebab-case for tags/categories/topics
-        norm = re.sub(r"\s+", "-", t.lower())
-        if norm not in seen:
-            out.append(norm); seen.add(norm)
-    return out
+    # normalize to kebab-case for tags/categories/topics; dict.fromkeys dedups in order
+    parts = (WHITESPACE_RE.sub("-", p.strip().lower()) for p in LIST_SPLIT_RE.split(s))
+    return [p for p in dict.fromkeys(parts) if p]
 
 def yaml_kv(k: str, v: Optional[str]) -> str:
     if not v:
@@ -131,18 +182,28 @@ def yaml_list_line(key: str, values: List[str]) -> str:
         return ""
     return f"{key}: [{', '.join(values)}]"
 
-def safe_write_unique(path: Path, content: str) -> Path:
-    """Avoid overwriting existing files by suffixing -1, -2, ..."""
+def unique_path(path: Path, taken: set) -> Path:
+    """Claim a new file by suffixing -1, -2, ... until an exclusive create succeeds.
+
+    The empty file is created here (O_EXCL, so no exists()/write race); render_note fills it.
+    `taken` holds names claimed this run so repeated slugs skip the failing opens.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
     p = path
     i = 1
-    while p.exists():
+    while True:
+        if p not in taken:
+            try:
+                os.close(os.open(p, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                break
+            except FileExistsError:
+                pass
         if p.suffix:
             p = p.with_name(f"{p.stem}-{i}{p.suffix}")
         else:
             p = Path(str(p) + f"-{i}")
         i += 1
-    p.write_text(content, encoding="utf-8")
+    taken.add(p)
     return p
 
 # ---------- header mapping helpers ----------
@@ -172,70 +233,152 @@ BLOG_ALIASES = {
     "author": {"author"},
 }
 
-def normalize_headers(aliases: Dict[str, set], row_keys: List[str]) -> Dict[str, str]:
+def invert_aliases(aliases: Dict[str, set]) -> Dict[str, str]:
+    """alias (lowercased) -> canonical field name"""
+    return {alias.lower(): canon for canon, names in aliases.items() for alias in names}
+
+LIVE_ALIAS_TO_CANON = invert_aliases(LIVE_ALIASES)
+BLOG_ALIAS_TO_CANON = invert_aliases(BLOG_ALIASES)
+
+def normalize_headers(alias_to_canon: Dict[str, str], row_keys: List[str]) -> Dict[str, str]:
+    """Map canonical field -> actual CSV header; the first matching column wins."""
     key_map: Dict[str, str] = {}
-    lower_map = {k.lower().strip(): k for k in row_keys}
-    for canon, names in aliases.items():
-        for alias in names:
-            if alias.lower() in lower_map:
-                key_map[canon] = lower_map[alias.lower()]
-                break
+    for k in row_keys:
+        canon = alias_to_canon.get(k.lower().strip())
+        if canon:
+            key_map.setdefault(canon, k)
     return key_map
 
 # ---------- builders ----------
-def build_yaml(
+YAML_ORDER = (
+    "title", "date", "session_id", "author", "url",
+    "video_url", "duration", "speakers", "site"
+)
+
+def write_yaml(
+    out: TextIO,
     meta: Dict[str, Optional[str]],
     tags: List[str],
     categories: List[str],
     topics: List[str],
     source: str
-) -> str:
-    lines = ["---"]
-    order = [
-        "title", "date", "session_id", "author", "url",
-        "video_url", "duration", "speakers", "site"
-    ]
-    for k in order:
+) -> None:
+    """Front matter block, from the opening to the closing '---' (no trailing newline)."""
+    out.write("---\n")
+    for k in YAML_ORDER:
         v = meta.get(k)
         if v:
-            lines.append(yaml_kv(k, v))
+            out.write(yaml_kv(k, v) + "\n")
     if topics:
-        lines.append(yaml_list_line("topics", topics))
+        out.write(yaml_list_line("topics", topics) + "\n")
     if tags:
-        lines.append(yaml_list_line("tags", tags))
+        out.write(yaml_list_line("tags", tags) + "\n")
     if categories:
-        lines.append(yaml_list_line("categories", categories))
-    lines.append(f"source: {source}")
-    lines.append(f"last_updated: {dt.date.today().isoformat()}")
-    lines.append("---")
-    return "\n".join([l for l in lines if l])
-
-def build_body(description_md: str, topics: List[str]) -> str:
-    body = []
+        out.write(yaml_list_line("categories", categories) + "\n")
+    out.write(f"source: {source}\n")
+    out.write(f"last_updated: {dt.date.today().isoformat()}\n")
+    out.write("---")
+
+def write_body(out: TextIO, description_md: str, topics: List[str]) -> None:
     if description_md:
-        body.append(description_md.strip())
-        body.append("")
+        out.write(description_md.strip())
+        out.write("\n\n")
     if topics:
-        body.append("key topics")
-        body.append("")
+        out.write("key topics\n\n")
         for t in topics:
-            body.append(f"- {t}")
-        body.append("")
-    body.append("notes")
-    body.append("")
-    body.append("_add session-specific notes, links, or highlights here_")
-    return "\n".join(body) + "\n"
+            out.write(f"- {t}\n")
+        out.write("\n")
+    out.write("notes\n\n_add session-specific notes, links, or highlights here_\n")
+
+def render_note(note: tuple) -> None:
+    """Convert one row's HTML and write its note; runs in a worker process."""
+    out_path, meta, tags, categories, topics, source, html = note
+    body_md = html_to_md(html)
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 16) as out:
+        write_yaml(out, meta, tags, categories, topics, source)
+        out.write("\n\n")
+        write_body(out, body_md, topics)
+
+def write_notes(out_dir: Path, notes: List[tuple]) -> int:
+    """notes: (fname, meta, tags, categories, topics, source, html) per row, in CSV order.
+
+    Final paths are picked here, in row order, so workers never race for a name and
+    duplicate slugs get the same -1, -2 suffixes as a serial run.
+    """
+    taken: set = set()
+    jobs = [(unique_path(out_dir / fname, taken), *rest) for fname, *rest in notes]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        for _ in ex.map(render_note, jobs, chunksize=32):
+            pass
+    return len(jobs)
+
+# ---------- transcripts ----------
+TRANSCRIPT_EXTS = {".md", ".txt"}
+
+def build_transcript_index(transcripts_dir: Optional[Path]) -> List[tuple]:
+    """(lowercased file name, path) for every transcript, from one walk of the folder."""
+    if not transcripts_dir or not transcripts_dir.exists():
+        return []
+    return [
+        (p.name.lower(), str(p).replace("\\", "/"))
+        for p in transcripts_dir.rglob("*")
+        if p.suffix.lower() in TRANSCRIPT_EXTS and p.is_file()
+    ]
 
-# ---------- kind: live ----------
-def process_live(csv_path: Path, out_dir: Path, transcripts_dir: Optional[Path]) -> int:
-    count = 0
+def find_transcript_path(index: List[tuple], session_id: str, slug: str) -> Optional[str]:
+    """First transcript whose name contains the session id or the slug."""
+    sid = session_id.lower() if session_id else None
+    for name, path in index:
+        if (sid and sid in name) or (slug in name):
+            return path
+    return None
+
+# ---------- CSV reading ----------
+def _read_arrow_rows(csv_path: Path) -> Optional[Tuple[List[str], Iterator[dict]]]:
+    """Parse the whole CSV with pyarrow (every column as text); None if it can't match csv.DictReader."""
+    with csv_path.open(newline="", encoding="utf-8-sig") as f:
+        fieldnames = next(csv.reader(f), None)
+    if not fieldnames or len(set(fieldnames)) != len(fieldnames):
+        return None  # DictReader lets the last duplicate column win; keep its behaviour
+    try:
+        table = pacsv.read_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(block_size=1 << 20),
+            # HTML bodies span lines inside quoted values
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(column_types={n: pa.string() for n in fieldnames}),
+        )
+    except (pa.ArrowInvalid, ValueError) as e:
+        print(f"[warn] pyarrow could not parse {csv_path.name} ({e}); using the csv module", file=sys.stderr)
+        return None
+
+    def rows() -> Iterator[dict]:
+        for batch in table.to_batches(max_chunksize=1024):
+            yield from batch.to_pylist()
+    return fieldnames, rows()
+
+@contextmanager
+def csv_rows(csv_path: Path) -> Iterator[Tuple[Optional[List[str]], Iterable[dict]]]:
+    """Yield (fieldnames, rows as dicts); large files go through pyarrow when available."""
+    if pacsv is not None and csv_path.stat().st_size >= ARROW_MIN_BYTES:
+        parsed = _read_arrow_rows(csv_path)
+        if parsed:
+            yield parsed
+            return
     with csv_path.open(newline="", encoding="utf-8-sig") as f:
         reader = csv.DictReader(f)
-        if not reader.fieldnames:
+        yield reader.fieldnames, reader
+
+# ---------- kind: live ----------
+def process_live(csv_path: Path, out_dir: Path, transcripts_dir: Optional[Path]) -> int:
+    notes = []
+    with csv_rows(csv_path) as (fieldnames, rows):
+        if not fieldnames:
             raise SystemExit("No headers found in the live sessions CSV.")
-        h = normalize_headers(LIVE_ALIASES, reader.fieldnames)
+        h = normalize_headers(LIVE_ALIAS_TO_CANON, fieldnames)
+        transcript_index = build_transcript_index(transcripts_dir)
 
-        for row in reader:
+        for row in rows:
             title = (row.get(h.get("title",""), "") or "Untitled Session").strip()
             session_id = (row.get(h.get("session_id",""), "") or "").strip()
             date_raw = (row.get(h.get("date",""), "") or "").strip()
@@ -246,8 +389,7 @@ def process_live(csv_path: Path, out_dir: Path, transcripts_dir: Optional[Path])
             url = (row.get(h.get("url",""), "") or "").strip()
             video_url = (row.get(h.get("video_url",""), "") or "").strip()
             if not video_url:
-                cand = extract_urls(desc_html)
-                video_url = pick_video_url(cand) or ""
+                video_url = find_video_url(desc_html) or ""
             duration = (row.get(h.get("duration",""), "") or "").strip()
             speakers = (row.get(h.get("speakers",""), "") or "").strip()
 
@@ -262,16 +404,7 @@ def process_live(csv_path: Path, out_dir: Path, transcripts_dir: Optional[Path])
                     tags.append(sid_tag)
 
             # optional transcript linking by heuristic (sid or slug inside filename)
-            related_transcript = None
-            if transcripts_dir and transcripts_dir.exists():
-                for p in transcripts_dir.rglob("*"):
-                    if p.is_file() and p.suffix.lower() in {".md",".txt"}:
-                        name = p.name.lower()
-                        if (session_id and session_id.lower() in name) or (slug in name):
-                            related_transcript = str(p).replace("\\","/")
-                            break
-
-            body_md = html_to_md(desc_html)
+            related_transcript = find_transcript_path(transcript_index, session_id, slug)
 
             meta = {
                 "title": title,
@@ -284,29 +417,23 @@ def process_live(csv_path: Path, out_dir: Path, transcripts_dir: Optional[Path])
                 "site": "academy",
             }
 
-            yaml = build_yaml(meta, tags, categories, topics, source="live-session")
-            md = f"{yaml}\n\n{build_body(body_md, topics)}"
-
             fname = f"{date_iso+'-' if date_iso else ''}{slug}.md"
-            out_path = out_dir / fname
-            safe_write_unique(out_path, md)
-            count += 1
+            notes.append((fname, meta, tags, categories, topics, "live-session", desc_html))
 
-    return count
+    return write_notes(out_dir, notes)
 
 # ---------- kind: blog ----------
 def process_blog(csv_path: Path, out_dir: Path, site: str) -> int:
     """
     site: 'cpa' or 'rrjr'
     """
-    count = 0
-    with csv_path.open(newline="", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
+    notes = []
+    with csv_rows(csv_path) as (fieldnames, rows):
+        if not fieldnames:
             raise SystemExit("No headers found in the blog CSV.")
-        h = normalize_headers(BLOG_ALIASES, reader.fieldnames)
+        h = normalize_headers(BLOG_ALIAS_TO_CANON, fieldnames)
 
-        for row in reader:
+        for row in rows:
             title = (row.get(h.get("title",""), "") or "Untitled").strip()
             date_iso = parse_date(row.get(h.get("date",""), "")) or ""
             url = (row.get(h.get("url",""), "") or "").strip()
@@ -319,7 +446,6 @@ def process_blog(csv_path: Path, out_dir: Path, site: str) -> int:
 
             # Prefer description, fall back to excerpt
             html = desc_html if desc_html.strip() else excerpt_html
-            body_md = html_to_md(html)
 
             meta = {
                 "title": title,
@@ -329,16 +455,11 @@ def process_blog(csv_path: Path, out_dir: Path, site: str) -> int:
                 "site": "cpa" if site == "cpa" else "rrjr",
             }
             src = "blog-cpa" if site == "cpa" else "blog-rrjr"
-            yaml = build_yaml(meta, tags, categories, topics, source=src)
-            md = f"{yaml}\n\n{build_body(body_md, topics)}"
-
             slug = slugify(title)
             fname = f"{date_iso+'-' if date_iso else ''}{slug}.md"
-            out_path = out_dir / fname
-            safe_write_unique(out_path, md)
-            count += 1
+            notes.append((fname, meta, tags, categories, topics, src, html))
 
-    return count
+    return write_notes(out_dir, notes)
 
 # ---------- main ----------
 def main():
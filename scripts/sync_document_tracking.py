@@ -4,25 +4,26 @@ Sync the document tracking database with what's actually in ChromaDB
 """
 
 import requests
-import json
 
 RAILWAY_API_URL = "https://academy-ai-production.up.railway.app"
 ADMIN_TOKEN = "supersecret123"
+URL_SYNC = f"{RAILWAY_API_URL}/admin/sync-documents"
+TIMEOUT = (3.05, 120)  # fail fast on connect; the sync itself can take a while
+
+SESSION = requests.Session()
+SESSION.headers["Authorization"] = f"Bearer {ADMIN_TOKEN}"
 
 def sync_documents():
     """Create an endpoint to sync document tracking with ChromaDB contents"""
-    headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
-    
     try:
         print("🔄 Triggering document tracking sync...")
-        response = requests.post(f"{RAILWAY_API_URL}/admin/sync-documents", headers=headers)
+        response = SESSION.post(URL_SYNC, timeout=TIMEOUT)
         
         if response.status_code == 200:
             result = response.json()
             print(f"✅ Sync completed: {result}")
         else:
-            print(f"❌ Sync failed: {response.status_code}")
-            print(f"Response: {response.text}")
+            print(f"❌ Sync failed: {response.status_code}\nResponse: {response.text}")
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -5,54 +5,162 @@ Transfer locally indexed content to Railway production database
 
 import os
 import sys
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import requests
-import json
-from typing import List, Dict
-import chromadb
-from chromadb.config import Settings
+import orjson
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List
 from dotenv import load_dotenv
 
+try:
+    import h2  # noqa: F401 -- lets httpx negotiate HTTP/2 (optional)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 load_dotenv()
 
 # Configuration
 LOCAL_CHROMA_DIR = "data/chroma"
 RAILWAY_API_URL = "https://academy-ai-production.up.railway.app"
+URL_STATUS = f"{RAILWAY_API_URL}/index-status"
+URL_BOOTSTRAP = f"{RAILWAY_API_URL}/admin/bootstrap"
+URL_REINDEX_STATUS = f"{RAILWAY_API_URL}/admin/reindex-status"
+URL_REINDEX_EVENTS = f"{RAILWAY_API_URL}/admin/reindex-events"
+# Paths for the transfer client, which carries RAILWAY_API_URL as its base_url
+PATH_IMPORT_CHUNKS = "/admin/import-chunks"
+PATH_SYNC = "/admin/sync-documents"
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "supersecret123")
 BATCH_SIZE = 50  # Upload in smaller batches
+UPLOAD_WORKERS = 8  # Batches in flight at once during a transfer
+# Text compresses well even at low levels; float32 vectors barely compress at any level
+GZIP_LEVEL = 3
+UPLOAD_ATTEMPTS = 5  # Tries per batch for 429/5xx and dropped connections
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+STATUS_TTL = 5.0  # seconds a fetched /index-status is reused
+POLL_MAX_DELAY = 30.0  # reindex polling backs off from 1s up to this while nothing changes
+# (connect, read) seconds; a stalled Railway edge fails the call instead of hanging the script
+TIMEOUT = (3.05, 30)
+BOOTSTRAP_TIMEOUT = (3.05, 120)  # bootstrap runs the document sync before answering
+
+# One keep-alive session for every Railway call; auth rides on the session.
+# Retry's default allowed_methods leaves POST out, so /admin/bootstrap is never re-sent.
+SESSION = requests.Session()
+SESSION.headers.update({"Authorization": f"Bearer {ADMIN_TOKEN}"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+))
 
 def get_local_collection():
     """Get the local ChromaDB collection"""
     try:
+        # Imported here: chromadb's import chain costs seconds of startup that
+        # the remote-reindex path never needs
+        import chromadb
+        from chromadb.config import Settings
         client = chromadb.PersistentClient(
             path=LOCAL_CHROMA_DIR,
             settings=Settings(allow_reset=True)
         )
-        return client.get_collection("academy_kb")
+        return client.get_collection("academy_kb", embedding_function=None)
     except Exception as e:
         print(f"Error accessing local collection: {e}")
         return None
 
-def upload_batch_to_railway(batch_data: Dict):
-    """Upload a batch of documents to Railway via the reindex endpoint"""
-    headers = {
-        "Authorization": f"Bearer {ADMIN_TOKEN}",
-        "Content-Type": "application/json"
+def fetch_batch(collection, offset: int, size: int) -> Dict:
+    """Read one page of chunks; only this page's vectors are held, packed as float32"""
+    page = collection.get(
+        limit=size,
+        offset=offset,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    return {
+        "ids": page["ids"],
+        "documents": page["documents"],
+        "embeddings": np.asarray(page["embeddings"], dtype=np.float32),
+        "metadatas": page["metadatas"],
     }
-    
+
+def railway_client() -> httpx.AsyncClient:
+    """Async client for the transfer; with h2 installed every batch POST shares one multiplexed connection"""
+    return httpx.AsyncClient(
+        base_url=RAILWAY_API_URL,
+        headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
+        timeout=httpx.Timeout(120.0, connect=10.0),
+        transport=httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+            retries=3,  # connect failures; sent batches are retried (with an Idempotency-Key) per batch
+        ),
+    )
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Honour Retry-After when the server sends seconds, else jittered exponential backoff"""
+    retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+    if retry_after.isdigit():
+        return min(float(retry_after), 60.0)
+    return 0.5 * 2 ** attempt + random.random() * 0.25
+
+async def upload_batch_to_railway(client: httpx.AsyncClient, batch_data: Dict) -> bool:
+    """Upload one batch of embedded chunks to Railway (upserted as-is, no re-embedding)"""
     try:
-        # Trigger reindex to ensure Railway collection exists
-        response = requests.post(f"{RAILWAY_API_URL}/reindex", headers=headers)
-        if response.status_code == 200:
-            print("✓ Railway reindex triggered successfully")
-        else:
-            print(f"Warning: Railway reindex returned {response.status_code}")
-            
-        return True
+        # Vectors travel as raw float32 (.npy), not decimal JSON; the text fields stay JSON
+        meta_json = orjson.dumps({k: batch_data[k] for k in ("ids", "documents", "metadatas")})
+        npy = io.BytesIO()
+        np.save(npy, batch_data["embeddings"], allow_pickle=False)
+        npy_bytes = npy.getvalue()
+        request = client.build_request("POST", PATH_IMPORT_CHUNKS, files={
+            "meta": ("meta.json", meta_json, "application/json"),
+            "embeddings": ("embeddings.npy", npy_bytes, "application/octet-stream"),
+        })
+        # The API inflates gzip request bodies
+        body = gzip.compress(request.read(), compresslevel=GZIP_LEVEL)
+        headers = {
+            "Content-Type": request.headers["Content-Type"],
+            "Content-Encoding": "gzip",
+            # Same chunks + same content -> same key, so the server can skip replays it already applied
+            "Idempotency-Key": hashlib.sha256(
+                b"\0".join(sorted(i.encode("utf-8") for i in batch_data["ids"])) + meta_json + npy_bytes
+            ).hexdigest(),
+        }
     except Exception as e:
-        print(f"Error uploading batch: {e}")
+        print(f"Error preparing batch: {e}")
+        return False
+    
+    # Retry just this batch on transient failures; the rest of the transfer carries on
+    for attempt in range(UPLOAD_ATTEMPTS):
+        response = None
+        try:
+            response = await client.post(PATH_IMPORT_CHUNKS, content=body, headers=headers)
+            if response.status_code == 200:
+                return True
+            if response.status_code not in RETRY_STATUSES:
+                break
+            error = f"{response.status_code} {response.text[:100]}"
+        except httpx.TransportError as e:
+            error = str(e)[:100]
+        if attempt < UPLOAD_ATTEMPTS - 1:
+            await asyncio.sleep(retry_delay(response, attempt))
+    else:
+        print(f"❌ Batch starting {batch_data['ids'][0]} failed after {UPLOAD_ATTEMPTS} attempts: {error}")
         return False
+    
+    print(f"❌ Batch starting {batch_data['ids'][0]} failed: {response.status_code} {response.text[:100]}")
+    return False
 
-def transfer_data():
+async def transfer_data():
     """Main transfer function"""
     print("🚀 Starting transfer of local ChromaDB to Railway...")
     
@@ -62,80 +170,186 @@ def transfer_data():
         print("❌ Could not access local collection")
         return False
     
-    # Get all data from local collection
+    # Chunks are read page by page as batches go out, never all at once
     try:
-        print("📊 Fetching local data...")
-        result = collection.get(
-            include=["documents", "metadatas", "embeddings"]
-        )
-        
-        total_docs = len(result["ids"])
+        total_docs = collection.count()
         print(f"📋 Found {total_docs} documents to transfer")
         
         if total_docs == 0:
             print("⚠️ No documents found in local collection")
             return False
             
-        # Since ChromaDB doesn't support direct bulk insert via API,
-        # we'll use the reindex approach to populate Railway
-        print("🔄 Triggering Railway reindex...")
-        success = upload_batch_to_railway({})
+        # UPLOAD_WORKERS workers each fetch a page, then upload it; memory stays at a few pages
+        uploaded = failed = 0
+        offsets = iter(range(0, total_docs, BATCH_SIZE))
         
-        if success:
-            print("✅ Transfer initiated successfully!")
-            print("⏱️ Railway indexing will run in background...")
+        async with railway_client() as client:
+            async def worker():
+                nonlocal uploaded, failed
+                for offset in offsets:  # shared iterator: each page is taken by one worker
+                    batch = await asyncio.to_thread(fetch_batch, collection, offset, BATCH_SIZE)
+                    if await upload_batch_to_railway(client, batch):
+                        uploaded += len(batch["ids"])
+                    else:
+                        failed += len(batch["ids"])
+                    print(f"📦 {uploaded + failed}/{total_docs} chunks sent ({failed} failed)")
+            
+            await asyncio.gather(*(worker() for _ in range(UPLOAD_WORKERS)))
+            
+            # Rebuild Railway's document list from the chunks it now holds
+            response = await client.post(PATH_SYNC)
+            if response.status_code != 200:
+                print(f"Warning: Railway document sync returned {response.status_code}")
+        
+        if failed == 0:
+            print(f"✅ Transferred {uploaded} chunks")
             return True
         else:
-            print("❌ Transfer failed")
+            print(f"❌ {failed} of {total_docs} chunks failed to transfer")
             return False
             
     except Exception as e:
         print(f"❌ Error during transfer: {e}")
         return False
 
-def check_railway_status():
-    """Check Railway indexing status"""
+_status_cache = {"at": 0.0, "status": None, "etag": None}
+
+def fetch_railway_status(max_age: float = STATUS_TTL):
+    """GET /index-status; a successful answer is reused for up to max_age seconds, then revalidated by ETag"""
+    now = time.monotonic()
+    if _status_cache["status"] is not None and now - _status_cache["at"] < max_age:
+        return _status_cache["status"]
+    headers = {"If-None-Match": _status_cache["etag"]} if _status_cache["etag"] else {}
+    response = SESSION.get(URL_STATUS, headers=headers, timeout=TIMEOUT)
+    if response.status_code == 304:
+        _status_cache["at"] = now
+        return _status_cache["status"]
+    if response.status_code != 200:
+        print(f"❌ Could not check Railway status: {response.status_code}")
+        return None
+    status = orjson.loads(response.content)
+    _status_cache.update(at=now, status=status, etag=response.headers.get("ETag"))
+    return status
+
+def print_progress(progress: Dict):
+    print(f"   ⏳ {progress.get('files_done') or 0}/{progress.get('files_total') or '?'} files, "
+          f"{progress.get('chunks') or 0} chunks ({progress.get('status')})")
+
+def follow_reindex_events():
+    """Follow the server-sent progress stream; returns the final run, or None if the stream is unavailable or drops"""
     try:
-        response = requests.get(f"{RAILWAY_API_URL}/index-status")
+        # The server sends a keep-alive at least every 15s, well inside the read timeout
+        with SESSION.get(URL_REINDEX_EVENTS, headers={"Accept": "text/event-stream"},
+                         stream=True, timeout=TIMEOUT) as response:
+            if response.status_code != 200:
+                return None
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                event = orjson.loads(line[5:])
+                print_progress(event)
+                if event.get("type") == "done":
+                    return event
+    except requests.RequestException as e:
+        print(f"   ⚠️ Progress stream dropped: {e}")
+    return None
+
+def wait_for_reindex():
+    """Wait for the reindex to finish: follow the event stream, else poll with a delay doubling from 1s to POLL_MAX_DELAY"""
+    progress = follow_reindex_events()
+    if progress is not None:
+        return progress
+    delay, etag, progress = 1.0, None, {}
+    while True:
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_DELAY)
+        try:
+            response = SESSION.get(URL_REINDEX_STATUS, headers={"If-None-Match": etag} if etag else {},
+                                   timeout=TIMEOUT)
+        except requests.RequestException as e:
+            print(f"   ⚠️ Progress check failed: {e}")
+            continue
         if response.status_code == 200:
-            status = response.json()
-            print(f"📊 Railway Status:")
-            print(f"   Vector Count: {status.get('vector_count', 0)}")
-            print(f"   Status: {status.get('status', 'Unknown')}")
-            print(f"   Last Indexed: {status.get('last_indexed', 'Never')}")
-            return status
-        else:
-            print(f"❌ Could not check Railway status: {response.status_code}")
-            return None
+            etag = response.headers.get("ETag")
+            progress = orjson.loads(response.content)
+            print_progress(progress)
+        elif response.status_code != 304:  # 304: unchanged since the last poll, nothing to parse
+            print(f"❌ Could not check reindex progress: {response.status_code}")
+            return progress
+        if progress.get("status") not in (None, "running"):
+            return progress
+
+def print_railway_status(status: Dict):
+    print("\n".join([
+        "📊 Railway Status:",
+        f"   Vector Count: {status.get('vector_count', 0)}",
+        f"   Status: {status.get('status', 'Unknown')}",
+        f"   Last Indexed: {status.get('last_indexed', 'Never')}",
+    ]))
+
+def check_railway_status(max_age: float = STATUS_TTL):
+    """Check Railway indexing status"""
+    try:
+        status = fetch_railway_status(max_age)
+        if status is not None:
+            print_railway_status(status)
+        return status
     except Exception as e:
         print(f"❌ Error checking Railway status: {e}")
         return None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate Railway's index")
+    parser.add_argument("--reindex", action="store_true",
+                        help="Re-embed everything on Railway even if a local index exists")
+    parser.add_argument("--wait", action="store_true",
+                        help="After starting a remote reindex, follow its progress until it finishes")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ACADEMY COMPANION - LOCAL TO RAILWAY TRANSFER")
     print("=" * 60)
     
-    # Check initial status
-    print("\n1️⃣ Checking initial Railway status...")
-    initial_status = check_railway_status()
+    # Local chunks already carry their embeddings: copying them skips Railway's
+    # 10-15 minute re-embedding run entirely
+    local = None
+    if not args.reindex:
+        # Overlap the status round trip with opening the local store; the
+        # answer lands in _status_cache for the check below
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(fetch_railway_status)
+            local = get_local_collection()
+    if local is not None and local.count() > 0:
+        print("\n1️⃣ Checking initial Railway status...")
+        check_railway_status()
+        asyncio.run(transfer_data())
+        check_railway_status(max_age=0)  # the count just changed
+        sys.exit(0)
     
-    # Actually, let's use a different approach - copy the ChromaDB files directly
-    print("\n🔄 Alternative approach: Using Railway's remote indexing...")
+    print("\n🔄 Using Railway's remote indexing...")
     print("This will process all documents directly on Railway...")
     
-    # Trigger remote indexing
-    headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+    # Status, document sync and remote indexing in a single round trip
     try:
-        response = requests.post(f"{RAILWAY_API_URL}/reindex", headers=headers)
+        response = SESSION.post(URL_BOOTSTRAP, timeout=BOOTSTRAP_TIMEOUT)
         if response.status_code == 200:
-            result = response.json()
-            print(f"✅ Remote indexing started: {result.get('message', 'Success')}")
-            print("⏱️ This will take 10-15 minutes to complete...")
-            print("🔄 You can check progress by refreshing the dashboard")
+            result = orjson.loads(response.content)
+            print("\n1️⃣ Initial Railway status:")
+            print_railway_status(result.get("initial_status", {}))
+            print(f"🔄 Document sync: {result.get('sync', {}).get('message', 'n/a')}")
+            if result.get("job_id") is not None:
+                print(f"✅ Remote indexing started (job {result['job_id']}): {result.get('message', 'Success')}")
+                print("⏱️ This will take 10-15 minutes to complete...")
+                if args.wait:
+                    progress = wait_for_reindex()
+                    print(f"🏁 Remote indexing {progress.get('status')}")
+                    check_railway_status(max_age=0)
+                else:
+                    print("🔄 You can check progress by refreshing the dashboard (or rerun with --wait)")
+            else:
+                print(f"⚠️ {result.get('message', 'A reindex is already in progress')}")
         else:
-            print(f"❌ Failed to start remote indexing: {response.status_code}")
-            print(f"Response: {response.text}")
+            print(f"❌ Failed to start remote indexing: {response.status_code}\nResponse: {response.text}")
     except Exception as e:
         print(f"❌ Error starting remote indexing: {e}")
     
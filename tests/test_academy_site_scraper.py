@@ -0,0 +1,43 @@
+"""Blog index parsing for scripts/academy_site_scraper.py."""
+import importlib.util
+import pathlib
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("lxml")
+pytest.importorskip("markdownify")
+
+SCRIPT = pathlib.Path(__file__).resolve().parent.parent / "scripts" / "academy_site_scraper.py"
+
+INDEX_HTML = """
+<html><body>
+  <nav><a href="/blog/">Blog</a></nav>
+  <div class="fl-post-feed">
+    <h2 class="fl-post-feed-title"><a href="/single-class-post/">Single class</a></h2>
+    <h2 class="fl-post-feed-title entry-title"><a href="/multi-class-post/">Multi class</a></h2>
+    <h2 class="entry-title fl-post-feed-title"><a href="https://creativepathworkshops.com/another-post/">Another</a></h2>
+    <h2 class="fl-post-feed-title"><a href="/single-class-post/">Repeated link</a></h2>
+    <h2 class="fl-post-feed-title"><a href="/category/news/">Category archive</a></h2>
+    <h2 class="fl-post-feed-title-alt"><a href="/not-a-title/">Lookalike class</a></h2>
+  </div>
+</body></html>
+"""
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    spec = importlib.util.spec_from_file_location("academy_site_scraper", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_post_urls_include_titles_with_extra_classes(scraper):
+    urls = scraper.post_urls_from_index(INDEX_HTML, "https://creativepathworkshops.com/blog")
+
+    assert urls == [
+        "https://creativepathworkshops.com/another-post/",
+        "https://creativepathworkshops.com/multi-class-post/",
+        "https://creativepathworkshops.com/single-class-post/",
+    ]
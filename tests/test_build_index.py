@@ -0,0 +1,139 @@
+"""Indexer tests; OpenAI and Chroma are replaced with in-memory fakes."""
+import importlib.util
+import os
+import pathlib
+
+import pytest
+
+SCRIPT = pathlib.Path(__file__).resolve().parent.parent / "scripts" / "build_index.py"
+
+
+class FakeEncoder:
+    """Whitespace tokens stand in for cl100k_base, which tiktoken would download"""
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = []
+
+    def encode_ordinary(self, text):
+        ids = []
+        for word in text.split(" "):
+            if word not in self.vocab:
+                self.vocab[word] = len(self.words)
+                self.words.append(word)
+            ids.append(self.vocab[word])
+        return ids
+
+    def encode_ordinary_batch(self, texts):
+        return [self.encode_ordinary(t) for t in texts]
+
+    def decode(self, tokens):
+        return " ".join(self.words[t] for t in tokens)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.records = {}
+
+    def get(self, ids=None, include=None, limit=None, offset=0, **kwargs):
+        if ids is None:
+            found = list(self.records)[offset:offset + limit if limit else None]
+        else:
+            found = [i for i in ids if i in self.records]
+        return {"ids": found, "documents": [self.records[i][1] for i in found],
+                "metadatas": [self.records[i][2] for i in found]}
+
+    def delete(self, ids=None, **kwargs):
+        for i in ids or []:
+            self.records.pop(i, None)
+
+    def count(self):
+        return len(self.records)
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection()
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch, collection):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    spec = importlib.util.spec_from_file_location("build_index", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def upsert_batched(c, ids, documents, metadatas, embeddings):
+        for record in zip(ids, documents, metadatas):
+            c.records[record[0]] = record
+
+    module.ENC = FakeEncoder()
+    module.ROOT_DIR = str(tmp_path)
+    module.RAW_ROOT = "raw"
+    module.METRICS_DB = str(tmp_path / "metrics.db")
+    module.get_collection = lambda: collection
+    module.upsert_batched = upsert_batched
+    module.embed_all_cached = lambda texts, **kwargs: [[0.0, 0.0, 1.0] for _ in texts]
+    return module
+
+
+def write_doc(root: pathlib.Path, rel: str, title: str, body: str):
+    path = root / "raw" / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\ntitle: {title}\n---\n{body}\n", encoding="utf-8")
+
+
+def test_chunks_carry_doc_id_when_titles_collide(indexer, collection, tmp_path):
+    write_doc(tmp_path, "sessions/composition.md", "Composition", "Leading lines and framing. " * 20)
+    write_doc(tmp_path, "blog/cpa/composition.md", "Composition", "Balance and negative space. " * 20)
+
+    indexer.index()
+
+    metas = [meta for _, _, meta in collection.records.values()]
+    assert {m["title"] for m in metas} == {"Composition"}
+    doc_ids = {m["doc_id"] for m in metas}
+    assert doc_ids == {
+        indexer.file_id(os.path.join("raw", "sessions", "composition.md")),
+        indexer.file_id(os.path.join("raw", "blog", "cpa", "composition.md")),
+    }
+
+
+def test_unchanged_docs_without_doc_id_are_rewritten(indexer, collection, tmp_path):
+    write_doc(tmp_path, "notes/light.md", "Light", "Golden hour and blue hour. " * 20)
+    indexer.index()
+    for chunk_id, (_, doc, meta) in list(collection.records.items()):
+        collection.records[chunk_id] = (chunk_id, doc, {k: v for k, v in meta.items() if k != "doc_id"})
+
+    indexer.index()
+
+    assert all("doc_id" in meta for _, _, meta in collection.records.values())
+
+
+def test_deleted_files_are_pruned(indexer, collection, tmp_path):
+    write_doc(tmp_path, "notes/light.md", "Light", "Golden hour and blue hour. " * 20)
+    write_doc(tmp_path, "notes/color.md", "Color", "Warm and cool palettes. " * 20)
+    indexer.index()
+    (tmp_path / "raw" / "notes" / "color.md").unlink()
+
+    indexer.index()
+
+    light = indexer.file_id(os.path.join("raw", "notes", "light.md"))
+    assert collection.records
+    assert {meta["doc_id"] for _, _, meta in collection.records.values()} == {light}
+    assert [doc_id for doc_id, _ in indexer.removed_docs([])] == [light]
+
+
+def test_embedding_cache_keeps_only_stored_chunks(indexer, collection, tmp_path):
+    indexer.ensure_metrics_db()
+    collection.records = {"c0": ("c0", "kept chunk", {}), "c1": ("c1", "another kept chunk", {})}
+    con = indexer.sqlite3.connect(indexer.METRICS_DB)
+    con.execute("CREATE TABLE chunk_embed_cache (key TEXT PRIMARY KEY, vec BLOB)")
+    con.executemany("INSERT INTO chunk_embed_cache VALUES (?, x'00')",
+                    [(indexer.chunk_embed_key(t),) for t in ("kept chunk", "another kept chunk", "old chunk")])
+    con.commit()
+
+    assert indexer.prune_chunk_embed_cache(collection) == 1
+
+    keys = {k for k, in con.execute("SELECT key FROM chunk_embed_cache")}
+    assert keys == {indexer.chunk_embed_key("kept chunk"), indexer.chunk_embed_key("another kept chunk")}
+    con.close()
@@ -0,0 +1,75 @@
+"""/admin/text-training; the indexer call is replaced with a recorder."""
+import importlib
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    data = tmp_path_factory.mktemp("data")
+    env = {
+        "OPENAI_API_KEY": "test",
+        "ADMIN_TOKEN": "test-token",
+        "METRICS_DB": str(data / "telemetry.db"),
+        "CHROMA_DIR": str(data / "chroma"),
+        "QUERY_CACHE_DB": str(data / "query_cache.sqlite"),
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    try:
+        yield importlib.import_module("app.main")
+    finally:
+        sys.path.remove(ROOT)
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@pytest.fixture
+def indexed(main, tmp_path, monkeypatch):
+    calls = []
+
+    def index_single_file(file_path, filename):
+        calls.append((file_path, filename, open(file_path, encoding="utf-8").read()))
+        return {"status": "indexed", "doc_id": "doc-1", "chunks": 2}
+
+    monkeypatch.setattr(main, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(main, "index_single_file", index_single_file)
+    monkeypatch.setattr(main, "uploads_changed", lambda: None)
+    return calls
+
+
+def post(main, content):
+    client = TestClient(main.app)
+    return client.post("/admin/text-training", json={"content": content},
+                       headers={"Authorization": "Bearer test-token"})
+
+
+def test_text_training_is_saved_and_indexed(main, indexed, tmp_path):
+    res = post(main, "Expose for the highlights.")
+
+    assert res.status_code == 200
+    assert res.json() == {"status": "saved", "characters": 26, "doc_id": "doc-1", "chunks": 2}
+    [(file_path, filename, text)] = indexed
+    assert os.path.dirname(file_path) == str(tmp_path / "data" / "uploads")
+    assert filename.startswith("text-training-") and filename.endswith(".md")
+    assert text == "Expose for the highlights."
+
+
+def test_blank_text_training_is_rejected(main, indexed):
+    res = post(main, "   ")
+
+    assert res.status_code == 400
+    assert indexed == []